@@ -0,0 +1,164 @@
+from datetime import datetime, timedelta
+from collections import defaultdict
+import sqlite3
+from typing import Dict, List, Optional, Tuple
+
+SERVICE_TYPES = ['Ambulance', 'Politie', 'Brandweer']
+
+# Number of days before the selected date used for trends
+TREND_DAYS = 7
+
+# Dashboard counts are read from incident_rollups_hourly, which holds the
+# number of incidents per (hour, service_type, region). The cost of a
+# query depends on the length of the window, not on the number of rows.
+REGIONS_QUERY = "SELECT DISTINCT region FROM incident_rollups_hourly ORDER BY region"
+
+ROLLUP_HOUR = "strftime('%Y-%m-%d %H:00:00', timestamp)"
+
+def update_rollups(conn: sqlite3.Connection, after_id: int):
+    """
+    Add the incidents inserted after `after_id` to the hourly rollups.
+    Must run in the transaction that inserted them.
+    """
+    conn.execute(f"""
+        INSERT INTO incident_rollups_hourly (hour, service_type, region, count)
+        SELECT {ROLLUP_HOUR}, service_type, region, COUNT(*)
+        FROM incidents
+        WHERE id > ?
+        GROUP BY 1, 2, 3
+        ON CONFLICT (hour, service_type, region) DO UPDATE SET count = count + excluded.count
+    """, (after_id,))
+
+def rebuild_rollups(conn: sqlite3.Connection) -> int:
+    """Rebuild the hourly rollups from the raw incidents. Returns the number of rollup rows."""
+    with conn:
+        conn.execute("DELETE FROM incident_rollups_hourly")
+        conn.execute(f"""
+            INSERT INTO incident_rollups_hourly (hour, service_type, region, count)
+            SELECT {ROLLUP_HOUR}, service_type, region, COUNT(*)
+            FROM incidents
+            GROUP BY 1, 2, 3
+        """)
+    return conn.execute("SELECT COUNT(*) FROM incident_rollups_hourly").fetchone()[0]
+
+def hourly_counts_query(region: Optional[str] = None) -> str:
+    """Query counting incidents per day, hour and service type in a range."""
+    return f"""
+        SELECT
+            substr(hour, 1, 10) as day,
+            CAST(substr(hour, 12, 2) AS INTEGER) as hour,
+            service_type,
+            SUM(count) as count
+        FROM incident_rollups_hourly
+        WHERE hour >= ? AND hour < ?{' AND region = ?' if region else ''}
+        GROUP BY day, hour, service_type
+    """
+
+def hotspots_query(region: Optional[str] = None) -> str:
+    """Query for the regions with most incidents in a range."""
+    return f"""
+        SELECT region, SUM(count) as incidents
+        FROM incident_rollups_hourly
+        WHERE hour >= ? AND hour < ?{' AND region = ?' if region else ''}
+        GROUP BY region
+        ORDER BY incidents DESC, region
+        LIMIT 5
+    """
+
+def dashboard_queries(start_date: datetime, region: Optional[str] = None) -> List[Tuple[str, str, list]]:
+    """Get the (name, sql, params) of every query aggregate_day runs."""
+    end_date = start_date + timedelta(days=1)
+    window_start = start_date - timedelta(days=TREND_DAYS)
+    region_params = [region] if region else []
+
+    return [
+        ("hourly counts", hourly_counts_query(region), [window_start, end_date] + region_params),
+        ("hotspots", hotspots_query(region), [start_date, end_date] + region_params)
+    ]
+
+def format_trend(current: int, previous: int) -> str:
+    """Format the change of a day's count against the previous daily average."""
+    previous_daily_avg = previous / TREND_DAYS if previous > 0 else 1
+    trend_pct = ((current - previous_daily_avg) / previous_daily_avg * 100) if previous_daily_avg > 0 else 0
+
+    return f"+{trend_pct:.0f}%" if trend_pct > 0 else f"{trend_pct:.0f}%" if trend_pct < 0 else "Stable"
+
+def aggregate_day(conn: sqlite3.Connection, start_date: datetime, region: Optional[str] = None) -> Dict:
+    """
+    Compute all dashboard statistics for a day in two grouped scans of
+    the hourly rollups.
+
+    The first scan groups the selected day and the TREND_DAYS days before it
+    by hour and service type, which is enough to derive the totals, timeline,
+    category breakdown, service trends and trend data. The second scan groups
+    the selected day by region for the hotspots.
+
+    Args:
+        conn: Database connection
+        start_date: Midnight of the selected day
+        region: Optional region filter
+
+    Returns:
+        Dictionary with the dashboard statistics (everything except the analysis)
+    """
+    (_, hourly_sql, hourly_params), (_, hotspots_sql, hotspots_params) = dashboard_queries(start_date, region)
+
+    # Hourly counts per service type for the whole trend window
+    hourly = conn.execute(hourly_sql, hourly_params).fetchall()
+
+    selected_day = start_date.strftime('%Y-%m-%d')
+    timeline = {service_type: {f"{hour:02d}:00": 0 for hour in range(24)} for service_type in SERVICE_TYPES}
+    category_breakdown = defaultdict(int)
+    day_counts = defaultdict(lambda: defaultdict(int))
+
+    for row in hourly:
+        day_counts[row['day']][row['service_type']] += row['count']
+        if row['day'] == selected_day:
+            category_breakdown[row['service_type']] += row['count']
+            if row['service_type'] in timeline:
+                timeline[row['service_type']][f"{row['hour']:02d}:00"] += row['count']
+
+    # Counts of the days before the selected day, per service type
+    previous_counts = defaultdict(int)
+    trend_data = []
+    for i in range(TREND_DAYS, -1, -1):
+        day_start = start_date - timedelta(days=i)
+        counts = day_counts.get(day_start.strftime('%Y-%m-%d'), {})
+        total_count = sum(counts.values())
+
+        if i > 0:
+            for service_type, count in counts.items():
+                previous_counts[service_type] += count
+
+        # SUM() over an empty day yields NULL, keep reporting that as None
+        trend_data.append({
+            'date': day_start.strftime('%Y-%m-%d'),
+            'count': total_count,
+            'ambulance_count': counts.get('Ambulance', 0) if total_count else None,
+            'police_count': counts.get('Politie', 0) if total_count else None,
+            'fire_count': counts.get('Brandweer', 0) if total_count else None
+        })
+
+    def service_count_and_trend(service_type: str) -> Dict:
+        current = category_breakdown.get(service_type, 0)
+        return {
+            "count": current,
+            "trend": format_trend(current, previous_counts.get(service_type, 0))
+        }
+
+    # Get hotspots (regions with most incidents)
+    hotspots = conn.execute(hotspots_sql, hotspots_params).fetchall()
+
+    return {
+        "total_incidents": sum(category_breakdown.values()),
+        "ambulance": service_count_and_trend("Ambulance"),
+        "police": service_count_and_trend("Politie"),
+        "fire": service_count_and_trend("Brandweer"),
+        "timeline": timeline,
+        "category_breakdown": dict(sorted(category_breakdown.items())),
+        "hotspots": [
+            {"location": row['region'], "incidents": row['incidents']}
+            for row in hotspots
+        ],
+        "trend_data": trend_data
+    }
@@ -1,25 +1,67 @@
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Type
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
 from instructor import OpenAISchema
 from pydantic import Field
 import instructor
+import openai
 from openai import OpenAI
+import hashlib
+import logging
+import os
+import random
 import sqlite3
 import json
-import os
+import threading
+import time
 from collections import defaultdict
+from .analysis import (SLICE_LENGTH, analysis_checkpoint, get_analysis_coverage, get_slices, get_stored_analysis,
+                       store_analysis, store_slice)
+from .db import get_db_connection
+from .clustering import cluster_messages
+from .ratelimit import TokenBucket
+from .prompts import (PATTERN_SHARE, PROMPT_TOKEN_BUDGET, TOP_REGIONS, count_tokens, format_incident, format_pattern,
+                      format_regions, get_stratified_samples, pack_lines)
 
-# Initialize instructor-wrapped client
-client = instructor.patch(OpenAI())
+# Instructor-wrapped client, created on first use so importing this module needs no API key
+_client = None
+_client_lock = threading.Lock()
 
 model = "gpt-4o-mini"
 
-def get_db_connection():
-    # Get database path from environment variable, fallback to data directory
-    db_path = os.getenv('DB_PATH', os.path.join('data', 'p2000.db'))
-    conn = sqlite3.connect(db_path)
-    conn.row_factory = sqlite3.Row
-    return conn
+# Cluster analyses running at the same time, and the timeout of a single LLM call in seconds
+CLUSTER_CONCURRENCY = int(os.getenv('AI_CONCURRENCY', '4'))
+LLM_TIMEOUT = float(os.getenv('LLM_TIMEOUT', '60'))
+
+# Attempts per LLM call, retried after a random delay of up to RETRY_BASE_DELAY * 2^attempt seconds
+LLM_ATTEMPTS = 3
+RETRY_BASE_DELAY = 1.0
+
+# Errors worth another attempt, anything else (bad request, authentication) is raised at once
+RETRYABLE_ERRORS = (openai.APITimeoutError, openai.APIConnectionError, openai.RateLimitError,
+                    openai.InternalServerError)
+
+# LLM requests per second across all threads of the process (retries included), 0 for no limit
+LLM_RATE_LIMIT = float(os.getenv('LLM_RATE_LIMIT', '0'))
+rate_limiter = TokenBucket(LLM_RATE_LIMIT) if LLM_RATE_LIMIT > 0 else None
+
+# USD per million prompt and completion tokens of the model, to estimate the cost of a run
+PROMPT_TOKEN_PRICE = float(os.getenv('LLM_PROMPT_PRICE', '0.15'))
+COMPLETION_TOKEN_PRICE = float(os.getenv('LLM_COMPLETION_PRICE', '0.60'))
+
+# Responses are cached in the database unless LLM_CACHE=0, least recently used are evicted past LLM_CACHE_MAX_MB
+cache_enabled = os.getenv('LLM_CACHE', '1') != '0'
+CACHE_MAX_BYTES = int(float(os.getenv('LLM_CACHE_MAX_MB', '64')) * 1024 * 1024)
+
+# Cache lookups of this process
+cache_stats = {'hits': 0, 'misses': 0}
+cache_stats_lock = threading.Lock()
+
+# Model requests of this process
+usage_stats = {'calls': 0, 'retries': 0, 'prompt_tokens': 0, 'completion_tokens': 0}
+usage_stats_lock = threading.Lock()
+
+logger = logging.getLogger(__name__)
 
 class IncidentCluster(OpenAISchema):
     """A cluster of related incidents"""
@@ -43,6 +85,12 @@ class IncidentTrend(OpenAISchema):
     description: str = Field(..., description="Description of the trend and its implications")
     supporting_evidence: List[str] = Field(..., description="List of evidence supporting this trend")
 
+class IncidentSliceSummary(OpenAISchema):
+    """Summary of the incidents of a slice of the day"""
+    summary: str = Field(..., description="Short summary of the incidents in this period")
+    severity_assessment: str = Field(..., description="High/Medium/Low based on incident types and frequency")
+    notable_incidents: List[str] = Field(..., description="Incidents or patterns in this period worth highlighting")
+
 class DailyIncidentAnalysis(OpenAISchema):
     """Complete analysis of incidents for a day"""
     date: datetime = Field(..., description="Date of the analysis")
@@ -52,46 +100,199 @@ class DailyIncidentAnalysis(OpenAISchema):
     summary: str = Field(..., description="Overall summary of the day's incidents")
     recommendations: List[str] = Field(..., description="Recommendations based on the analysis")
 
-def get_incident_clusters(conn: sqlite3.Connection, start_date: datetime, end_date: datetime) -> Dict:
-    """Get incident clusters and statistics using SQL aggregation."""
+def get_client():
+    """Get the instructor-wrapped OpenAI client, retries are done by complete()."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = instructor.patch(OpenAI(max_retries=0))
+        return _client
+
+def get_cache_key(response_model: Type[OpenAISchema], prompt: str, temperature: float) -> str:
+    """Get the content address of a request: everything the response depends on."""
+    request = {
+        'model': model,
+        'schema': response_model.model_json_schema(),
+        'prompt': prompt,
+        'temperature': temperature
+    }
+    return hashlib.sha256(json.dumps(request, sort_keys=True).encode()).hexdigest()
+
+def get_cached_response(key: str, response_model: Type[OpenAISchema]) -> Optional[OpenAISchema]:
+    """Get a cached response and mark it as recently used."""
+    with get_db_connection() as conn:
+        row = conn.execute("SELECT response FROM llm_cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        conn.execute("""
+            UPDATE llm_cache SET hits = hits + 1, last_used_at = CURRENT_TIMESTAMP WHERE key = ?
+        """, (key,))
+    return response_model.model_validate_json(row['response'])
+
+def store_cached_response(key: str, response: OpenAISchema):
+    """Cache a response, evicting the least recently used ones past CACHE_MAX_BYTES."""
+    data = response.model_dump_json()
+    with get_db_connection() as conn:
+        conn.execute("""
+            INSERT OR REPLACE INTO llm_cache (key, model, response, size) VALUES (?, ?, ?, ?)
+        """, (key, model, data, len(data)))
+        conn.execute("""
+            DELETE FROM llm_cache WHERE key IN (
+                SELECT key FROM (
+                    SELECT key, SUM(size) OVER (ORDER BY last_used_at DESC, rowid DESC) AS total
+                    FROM llm_cache
+                )
+                WHERE total > ?
+            )
+        """, (CACHE_MAX_BYTES,))
+
+def get_cache_summary() -> Dict:
+    """Get the size of the response cache and the hit rate of this process."""
+    with get_db_connection() as conn:
+        row = conn.execute("""
+            SELECT COUNT(*) AS entries, COALESCE(SUM(size), 0) AS size, COALESCE(SUM(hits), 0) AS hits
+            FROM llm_cache
+        """).fetchone()
+    with cache_stats_lock:
+        lookups = cache_stats['hits'] + cache_stats['misses']
+        return {
+            'enabled': cache_enabled,
+            'entries': row['entries'],
+            'size': row['size'],
+            'max_size': CACHE_MAX_BYTES,
+            'total_hits': row['hits'],
+            'hits': cache_stats['hits'],
+            'misses': cache_stats['misses'],
+            'hit_rate': round(cache_stats['hits'] / lookups, 3) if lookups else None
+        }
+
+def get_usage_summary() -> Dict:
+    """Get the model requests and token usage of this process, with their estimated cost."""
+    with usage_stats_lock:
+        usage = dict(usage_stats)
+    usage['cost'] = (usage['prompt_tokens'] * PROMPT_TOKEN_PRICE
+                     + usage['completion_tokens'] * COMPLETION_TOKEN_PRICE) / 1_000_000
+    return usage
+
+def record_call(date: Optional[datetime], response_model: Type[OpenAISchema], outcome: str, total_ms: float,
+                latency_ms: Optional[float] = None, retries: int = 0, prompt_tokens: int = 0,
+                completion_tokens: int = 0, error: Optional[str] = None):
+    """Log a model request (or a response served from the cache) in llm_calls."""
+    cost = (prompt_tokens * PROMPT_TOKEN_PRICE + completion_tokens * COMPLETION_TOKEN_PRICE) / 1_000_000
+    try:
+        with get_db_connection() as conn:
+            conn.execute("""
+                INSERT INTO llm_calls
+                (date, model, response_model, outcome, prompt_tokens, completion_tokens, cost,
+                 latency_ms, total_ms, retries, error)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (
+                date.strftime('%Y-%m-%d') if date else None,
+                model,
+                response_model.__name__,
+                outcome,
+                prompt_tokens,
+                completion_tokens,
+                cost,
+                latency_ms,
+                total_ms,
+                retries,
+                error
+            ))
+    except sqlite3.Error as e:
+        # The log must never fail an analysis
+        logger.warning(f"Could not record {response_model.__name__} call: {str(e)}")
+
+def complete(response_model: Type[OpenAISchema], prompt: str, temperature: float = 0.2,
+             date: Optional[datetime] = None) -> OpenAISchema:
+    """
+    Ask the model for a structured response, retrying transient errors with
+    jitter. Identical requests are answered from the response cache. Every
+    call is logged in llm_calls under the analysis `date`.
+    """
+    started = time.perf_counter()
+    key = get_cache_key(response_model, prompt, temperature) if cache_enabled else None
+    if key:
+        cached = get_cached_response(key, response_model)
+        with cache_stats_lock:
+            cache_stats['hits' if cached else 'misses'] += 1
+        if cached:
+            record_call(date, response_model, 'cached', (time.perf_counter() - started) * 1000)
+            return cached
+
+    response = request_completion(response_model, prompt, temperature, date)
+    if key:
+        store_cached_response(key, response)
+    return response
+
+def request_completion(response_model: Type[OpenAISchema], prompt: str, temperature: float,
+                       date: Optional[datetime] = None) -> OpenAISchema:
+    """
+    Call the model within the rate limit, retrying transient errors with
+    jitter. The latency logged is that of the last attempt, the total time
+    includes retries and waiting for the rate limit.
+    """
+    started = time.perf_counter()
+    for attempt in range(LLM_ATTEMPTS):
+        if rate_limiter:
+            rate_limiter.acquire()
+        with usage_stats_lock:
+            usage_stats['calls'] += 1
+            usage_stats['retries'] += attempt > 0
+        requested = time.perf_counter()
+        try:
+            response = get_client().chat.completions.create(
+                model=model,
+                response_model=response_model,
+                messages=[
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=temperature,
+                timeout=LLM_TIMEOUT
+            )
+        except Exception as e:
+            finished = time.perf_counter()
+            if not isinstance(e, RETRYABLE_ERRORS) or attempt == LLM_ATTEMPTS - 1:
+                record_call(date, response_model, 'error', (finished - started) * 1000,
+                            (finished - requested) * 1000, attempt, error=str(e))
+                raise
+            delay = random.uniform(0, RETRY_BASE_DELAY * 2 ** attempt)
+            logger.warning(f"{response_model.__name__} call failed ({str(e)}), retrying in {delay:.1f}s")
+            time.sleep(delay)
+            continue
+
+        finished = time.perf_counter()
+        usage = getattr(getattr(response, '_raw_response', None), 'usage', None)
+        prompt_tokens = usage.prompt_tokens if usage else 0
+        completion_tokens = usage.completion_tokens if usage else 0
+        with usage_stats_lock:
+            usage_stats['prompt_tokens'] += prompt_tokens
+            usage_stats['completion_tokens'] += completion_tokens
+        record_call(date, response_model, 'ok', (finished - started) * 1000, (finished - requested) * 1000,
+                    attempt, prompt_tokens, completion_tokens)
+        return response
+
+def get_incident_clusters(conn: sqlite3.Connection, start_date: datetime, end_date: datetime,
+                          prompt_tokens: Optional[Dict[str, int]] = None) -> List[IncidentCluster]:
+    """
+    Get incident clusters and statistics using SQL aggregation.
+
+    Every cluster prompt holds a sample stratified by hour, region and
+    message type, packed to PROMPT_TOKEN_BUDGET. Their token counts are
+    added to `prompt_tokens` when given.
+
+    The clusters are analyzed concurrently. A cluster whose analysis fails
+    is returned with its statistics only, so the daily analysis still
+    covers it.
+    """
     
-    # Get service type clusters with counts and sample incidents
+    # Get service type clusters with counts
     service_clusters = conn.execute("""
-        WITH AllIncidents AS (
-            SELECT 
-                service_type,
-                COUNT(*) as total_count,
-                GROUP_CONCAT(DISTINCT region) as regions
-            FROM incidents
-            WHERE timestamp >= ? AND timestamp < ?
-            GROUP BY service_type
-        ),
-        SampleIncidents AS (
-            SELECT 
-                *,
-                ROW_NUMBER() OVER (PARTITION BY service_type ORDER BY timestamp) as rn
-            FROM incidents
-            WHERE timestamp >= ? AND timestamp < ?
-        )
-        SELECT 
-            a.service_type,
-            a.total_count as incident_count,
-            a.regions,
-            json_group_array(
-                json_object(
-                    'timestamp', s.timestamp,
-                    'service_type', s.service_type,
-                    'region', s.region,
-                    'message', s.message,
-                    'details', s.details
-                )
-            ) as sample_incidents
-        FROM AllIncidents a
-        LEFT JOIN (
-            SELECT * FROM SampleIncidents WHERE rn <= 5
-        ) s ON a.service_type = s.service_type
-        GROUP BY a.service_type
-    """, (start_date, end_date, start_date, end_date)).fetchall()
+        SELECT service_type, COUNT(*) as incident_count
+        FROM incidents
+        WHERE timestamp >= ? AND timestamp < ?
+        GROUP BY service_type
+    """, (start_date, end_date)).fetchall()
     
     # Get hourly distribution
     hourly_stats = conn.execute("""
@@ -117,55 +318,95 @@ def get_incident_clusters(conn: sqlite3.Connection, start_date: datetime, end_da
         ORDER BY service_type, count DESC
     """, (start_date, end_date)).fetchall()
     
+    # Get sample candidates spread over the day
+    samples = get_stratified_samples(conn, start_date, end_date)
+    
+    # Group every service type's messages into patterns locally, the model only sees the patterns
+    messages = defaultdict(list)
+    for row in conn.execute("""
+        SELECT service_type, timestamp, region, message
+        FROM incidents
+        WHERE timestamp >= ? AND timestamp < ?
+    """, (start_date, end_date)):
+        messages[row['service_type']].append(row)
+    patterns = {service_type: cluster_messages(rows) for service_type, rows in messages.items()}
+    
     # Process hourly stats into peak hours
     peak_hours = defaultdict(list)
     for stat in hourly_stats:
         if len(peak_hours[stat['service_type']]) < 3:  # Keep top 3 hours
             peak_hours[stat['service_type']].append(int(stat['hour']))
     
-    # Process results into clusters
-    clusters = []
+    # Process regional stats into (region, count) pairs, busiest first
+    regions = defaultdict(list)
+    for stat in regional_stats:
+        regions[stat['service_type']].append((stat['region'], stat['count']))
+    
+    # Process results into cluster prompts
+    prompts = []
     for cluster in service_clusters:
-        sample_incidents = json.loads(cluster['sample_incidents'])
-        regions = [r.strip() for r in cluster['regions'].split(',')]
-        
-        # Create cluster prompt
-        incidents_text = "\n".join([
-            f"Incident {i+1}:\n" + "\n".join(f"{k}: {v}" for k, v in incident.items())
-            for i, incident in enumerate(sample_incidents)
-        ])
-        
-        prompt = f"""Analyze this cluster of {cluster['incident_count']} {cluster['service_type']} incidents.
-Here are 5 sample incidents from the cluster for pattern identification:
+        service_type = cluster['service_type']
+        template = f"""Analyze this cluster of {cluster['incident_count']} {service_type} incidents.
+Its messages fall into {len(patterns[service_type])} patterns. The {{patterns_count}} largest (incidents | peak hours | top regions | message, with * for varying words and # for numbers):
+
+{{patterns}}
+
+Here are {{samples_count}} sample incidents (time | region | message), spread over the hours, regions and message types of the day:
 
-{incidents_text}
+{{samples}}
 
 Additional information:
 - Total incidents in this cluster: {cluster['incident_count']}
-- Peak activity hours: {peak_hours[cluster['service_type']]}
-- Regions involved: {regions}
-
-Based on these samples and statistics, identify patterns and assess overall severity."""
-
-        # Get cluster analysis
-        cluster_analysis = client.chat.completions.create(
-            model=model,
-            response_model=IncidentCluster,
-            messages=[
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.2
-        )
-        clusters.append(cluster_analysis)
+- Peak activity hours: {peak_hours[service_type]}
+- Regions involved (incidents): {format_regions(regions[service_type])}
+
+Based on these patterns, samples and statistics, identify patterns and assess overall severity."""
+        
+        # The patterns take up to PATTERN_SHARE of the budget, samples fill the rest
+        service_patterns = patterns[service_type]
+        service_samples = samples.get(service_type, [])
+        prompt, _, pattern_count = pack_lines(template, 'patterns', [format_pattern(p) for p in service_patterns],
+                                             int(PROMPT_TOKEN_BUDGET * PATTERN_SHARE))
+        prompt, tokens, sample_count = pack_lines(prompt, 'samples', [format_incident(row) for row in service_samples])
+        included = service_samples[:sample_count]
+        logger.info(f"{service_type} prompt: {tokens} tokens, {pattern_count} of {len(service_patterns)} patterns "
+                    f"covering {sum(p['count'] for p in service_patterns[:pattern_count])} of "
+                    f"{cluster['incident_count']} incidents, {sample_count} samples from "
+                    f"{len({row['hour'] for row in included})} hours")
+        if prompt_tokens is not None:
+            prompt_tokens[service_type] = tokens
+        prompts.append(prompt)
+    
+    if not prompts:
+        return []
+    
+    # Get cluster analyses
+    with ThreadPoolExecutor(max_workers=min(CLUSTER_CONCURRENCY, len(prompts))) as pool:
+        futures = [pool.submit(complete, IncidentCluster, prompt, date=start_date) for prompt in prompts]
+    
+    clusters = []
+    for cluster, future in zip(service_clusters, futures):
+        try:
+            clusters.append(future.result())
+        except Exception as e:
+            logger.error(f"Analysis of the {cluster['service_type']} cluster failed: {str(e)}")
+            clusters.append(IncidentCluster(
+                cluster_type=cluster['service_type'],
+                incident_count=cluster['incident_count'],
+                peak_hours=peak_hours[cluster['service_type']],
+                regions=[region for region, _ in regions[cluster['service_type']]],
+                severity_assessment="Unknown (cluster analysis failed)",
+                key_patterns=[p['template'] for p in patterns[cluster['service_type']][:5]]
+            ))
     
     return clusters
 
-def analyze_daily_incidents(incidents: List[dict], date: datetime) -> DailyIncidentAnalysis:
+def analyze_daily_incidents(incidents: Optional[List[dict]], date: datetime) -> DailyIncidentAnalysis:
     """
     Analyze incidents for a day using database-level aggregation
     
     Args:
-        incidents: List of incident dictionaries (used only for total count)
+        incidents: Unused, the incidents are aggregated from the database
         date: Date of the incidents
     
     Returns:
@@ -186,7 +427,8 @@ def analyze_daily_incidents(incidents: List[dict], date: datetime) -> DailyIncid
         """, (start_date, end_date)).fetchone()
         
         # Get clusters using database aggregation
-        clusters = get_incident_clusters(conn, start_date, end_date)
+        prompt_tokens = {}
+        clusters = get_incident_clusters(conn, start_date, end_date, prompt_tokens)
         
         # Prepare final analysis prompt with cluster insights
         clusters_text = "\n".join([
@@ -194,7 +436,7 @@ def analyze_daily_incidents(incidents: List[dict], date: datetime) -> DailyIncid
             f"Count: {c.incident_count}\n"
             f"Severity: {c.severity_assessment}\n"
             f"Patterns: {', '.join(c.key_patterns)}\n"
-            f"Regions: {', '.join(c.regions)}\n"
+            f"Regions: {', '.join(c.regions[:TOP_REGIONS])}\n"
             for c in clusters
         ])
         
@@ -209,165 +451,135 @@ Statistics:
 - Service types: {stats['unique_services']}
 
 Provide a comprehensive analysis including key highlights, trends, and recommendations."""
+        prompt_tokens['final'] = count_tokens(prompt)
+        logger.info(f"Prompt tokens for {start_date.strftime('%Y-%m-%d')}: {sum(prompt_tokens.values())} "
+                    f"({', '.join(f'{name} {tokens}' for name, tokens in prompt_tokens.items())})")
 
         # Get final analysis
-        analysis = client.chat.completions.create(
-            model=model,
-            response_model=DailyIncidentAnalysis,
-            messages=[
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.2
-        )
+        analysis = complete(DailyIncidentAnalysis, prompt, date=start_date)
         
+        # Keep the analysis under the requested day, whatever date the model returned
+        analysis.date = start_date
         return analysis
 
-def init_analysis_tables():
-    """Initialize the database tables for incident analysis"""
-    with get_db_connection() as conn:
-        conn.execute("""
-        CREATE TABLE IF NOT EXISTS incident_analysis (
-            date TEXT PRIMARY KEY,
-            total_incidents INTEGER,
-            summary TEXT,
-            recommendations TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-        """)
-        
-        conn.execute("""
-        CREATE TABLE IF NOT EXISTS incident_highlights (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            date TEXT,
-            title TEXT,
-            description TEXT,
-            severity TEXT,
-            affected_areas TEXT,
-            FOREIGN KEY (date) REFERENCES incident_analysis(date)
-        )
-        """)
-        
-        conn.execute("""
-        CREATE TABLE IF NOT EXISTS incident_trends (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            date TEXT,
-            trend_name TEXT,
-            description TEXT,
-            supporting_evidence TEXT,
-            FOREIGN KEY (date) REFERENCES incident_analysis(date)
-        )
-        """)
-        conn.commit()
+def build_slice_prompt(conn: sqlite3.Connection, slice_start: datetime, slice_end: datetime) -> str:
+    """Build the prompt summarizing the incidents of a slice from their patterns."""
+    rows = conn.execute("""
+        SELECT service_type, timestamp, region, message
+        FROM incidents
+        WHERE timestamp >= ? AND timestamp < ?
+    """, (slice_start, slice_end)).fetchall()
+    
+    services = defaultdict(int)
+    for row in rows:
+        services[row['service_type']] += 1
+    patterns = cluster_messages(rows)
+    
+    template = f"""Summarize the {len(rows)} incidents between {slice_start.strftime('%H:%M')} and {slice_end.strftime('%H:%M')} on {slice_start.strftime('%Y-%m-%d')}.
+Incidents per service type: {', '.join(f'{name} {count}' for name, count in sorted(services.items(), key=lambda item: -item[1]))}
 
-# Initialize tables
-init_analysis_tables()
+Their messages fall into {len(patterns)} patterns. The {{patterns_count}} largest (incidents | top regions | message, with * for varying words and # for numbers):
 
-def store_analysis(analysis: DailyIncidentAnalysis):
-    """Store the incident analysis in the database"""
-    date_str = analysis.date.strftime('%Y-%m-%d')
-    
-    with get_db_connection() as conn:
-        # Store main analysis
-        conn.execute("""
-        INSERT OR REPLACE INTO incident_analysis 
-        (date, total_incidents, summary, recommendations)
-        VALUES (?, ?, ?, ?)
-        """, (
-            date_str,
-            analysis.total_incidents,
-            analysis.summary,
-            json.dumps(analysis.recommendations)
-        ))
-        
-        # Clear existing highlights and trends for this date
-        conn.execute("DELETE FROM incident_highlights WHERE date = ?", (date_str,))
-        conn.execute("DELETE FROM incident_trends WHERE date = ?", (date_str,))
-        
-        # Store highlights
-        for highlight in analysis.key_highlights:
-            conn.execute("""
-            INSERT INTO incident_highlights 
-            (date, title, description, severity, affected_areas)
-            VALUES (?, ?, ?, ?, ?)
-            """, (
-                date_str,
-                highlight.title,
-                highlight.description,
-                highlight.severity,
-                json.dumps(highlight.affected_areas)
-            ))
-        
-        # Store trends
-        for trend in analysis.identified_trends:
-            conn.execute("""
-            INSERT INTO incident_trends
-            (date, trend_name, description, supporting_evidence)
-            VALUES (?, ?, ?, ?)
-            """, (
-                date_str,
-                trend.trend_name,
-                trend.description,
-                json.dumps(trend.supporting_evidence)
-            ))
-        
-        conn.commit()
+{{patterns}}
+
+Summarize what happened, assess the severity and list the notable incidents."""
+    prompt, _, _ = pack_lines(template, 'patterns', [format_pattern(p, hours=False) for p in patterns])
+    return prompt
 
-def get_stored_analysis(date: datetime) -> Optional[dict]:
-    """Retrieve stored analysis for a given date"""
-    date_str = date.strftime('%Y-%m-%d')
+def update_intraday_analysis(date: datetime, now: Optional[datetime] = None) -> bool:
+    """
+    Bring the analysis of a day up to its checkpoint (see analysis_checkpoint)
+    incrementally: only slices that are new or received incidents since they
+    were analyzed are summarized, then all slice summaries are merged into
+    the day's analysis. Returns whether an analysis was stored.
+    """
+    start_date = date.replace(hour=0, minute=0, second=0, microsecond=0)
+    checkpoint = analysis_checkpoint(start_date, now)
     
     with get_db_connection() as conn:
-        # Get main analysis
-        analysis = conn.execute(
-            "SELECT * FROM incident_analysis WHERE date = ?",
-            (date_str,)
-        ).fetchone()
+        slices = get_slices(conn, start_date)
+        counts = conn.execute("""
+            SELECT strftime('%H', timestamp) AS hour, COUNT(*) AS count, MAX(id) AS last_id
+            FROM incidents
+            WHERE timestamp >= ? AND timestamp < ?
+            GROUP BY hour
+        """, (start_date, checkpoint)).fetchall()
+        counts = {int(row['hour']): row for row in counts}
         
-        if not analysis:
-            return None
+        # Find the slices that changed since they were analyzed
+        changed = []
+        slice_start = start_date
+        while slice_start < checkpoint:
+            row = counts.get(slice_start.hour)
+            count, last_id = (row['count'], row['last_id']) if row else (0, 0)
+            stored = slices.get(str(slice_start))
+            if stored is None or stored['incident_count'] != count or stored['last_incident_id'] != last_id:
+                changed.append((slice_start, count, last_id))
+            slice_start += SLICE_LENGTH
         
-        # Get highlights
-        highlights = conn.execute(
-            "SELECT * FROM incident_highlights WHERE date = ?",
-            (date_str,)
-        ).fetchall()
+        coverage = get_analysis_coverage(conn, start_date)
+        if not changed and coverage is not None and coverage >= checkpoint:
+            return False
         
-        # Get trends
-        trends = conn.execute(
-            "SELECT * FROM incident_trends WHERE date = ?",
-            (date_str,)
-        ).fetchall()
+        # Summarize the changed slices, empty slices need no model call
+        busy = [(slice_start, count, last_id) for slice_start, count, last_id in changed if count]
+        prompts = [build_slice_prompt(conn, slice_start, slice_start + SLICE_LENGTH) for slice_start, _, _ in busy]
+        if busy:
+            with ThreadPoolExecutor(max_workers=min(CLUSTER_CONCURRENCY, len(busy))) as pool:
+                summaries = list(pool.map(
+                    lambda prompt: complete(IncidentSliceSummary, prompt, date=start_date), prompts
+                ))
+        else:
+            summaries = []
+        for (slice_start, count, last_id), summary in zip(busy, summaries):
+            store_slice(conn, slice_start, count, last_id, summary.summary, summary.severity_assessment,
+                        summary.notable_incidents)
+        for slice_start, count, last_id in changed:
+            if not count:
+                store_slice(conn, slice_start, count, last_id)
+        logger.info(f"Analyzed {len(busy)} new slices of {start_date.strftime('%Y-%m-%d')} "
+                    f"up to {checkpoint.strftime('%H:%M')}")
         
-        return {
-            "date": date_str,
-            "total_incidents": analysis['total_incidents'],
-            "summary": analysis['summary'],
-            "recommendations": json.loads(analysis['recommendations']),
-            "highlights": [
-                {
-                    "title": h['title'],
-                    "description": h['description'],
-                    "severity": h['severity'],
-                    "affected_areas": json.loads(h['affected_areas'])
-                }
-                for h in highlights
-            ],
-            "trends": [
-                {
-                    "name": t['trend_name'],
-                    "description": t['description'],
-                    "evidence": json.loads(t['supporting_evidence'])
-                }
-                for t in trends
-            ]
-        }
+        # Merge the slice summaries into the analysis of the day so far
+        summaries_text = "\n".join(
+            f"{row['slice_start'][11:16]} | {row['incident_count']} incidents | {row['severity']} | "
+            f"{row['summary']} | Notable: {'; '.join(json.loads(row['notable_incidents']))}"
+            for row in get_slices(conn, start_date).values()
+            if row['incident_count'] and row['slice_start'] < str(checkpoint)
+        )
+        if not summaries_text:
+            return False
+        
+        stats = conn.execute("""
+            SELECT 
+                COUNT(*) as total_incidents,
+                COUNT(DISTINCT region) as unique_regions,
+                COUNT(DISTINCT service_type) as unique_services
+            FROM incidents
+            WHERE timestamp >= ? AND timestamp < ?
+        """, (start_date, checkpoint)).fetchone()
+    
+    prompt = f"""Analyze the incidents of {start_date.strftime('%Y-%m-%d')} until {checkpoint.strftime('%H:%M')} from these hourly summaries (hour | incidents | severity | summary | notable incidents):
+
+{summaries_text}
+
+Statistics:
+- Total incidents: {stats['total_incidents']}
+- Unique regions: {stats['unique_regions']}
+- Service types: {stats['unique_services']}
+
+Provide a comprehensive analysis including key highlights, trends, and recommendations."""
+    analysis = complete(DailyIncidentAnalysis, prompt, date=start_date)
+    analysis.date = start_date
+    store_analysis(analysis, None if checkpoint >= start_date + timedelta(days=1) else checkpoint)
+    return True
 
-def get_incident_insights(incidents: List[dict], date: Optional[datetime] = None) -> dict:
+def get_incident_insights(incidents: Optional[List[dict]], date: Optional[datetime] = None) -> dict:
     """
     Get insights and analysis for a list of incidents
     
     Args:
-        incidents: List of incident dictionaries
+        incidents: Unused, the incidents are aggregated from the database
         date: Optional date for the analysis, defaults to current date
     
     Returns:
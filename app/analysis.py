@@ -0,0 +1,161 @@
+from datetime import datetime, timedelta
+import json
+import sqlite3
+from typing import Dict, List, Optional, TYPE_CHECKING
+from .db import get_db_connection
+
+if TYPE_CHECKING:
+    from .ai import DailyIncidentAnalysis
+
+# Length of the slices a day is analyzed in while it is still running
+SLICE_LENGTH = timedelta(hours=1)
+
+def analysis_checkpoint(date: datetime, now: Optional[datetime] = None) -> datetime:
+    """Get the end of the last complete slice of a day: the most an analysis can cover now."""
+    start_date = date.replace(hour=0, minute=0, second=0, microsecond=0)
+    now = (now or datetime.now()).replace(minute=0, second=0, microsecond=0)
+    return max(start_date, min(start_date + timedelta(days=1), now))
+
+def get_analysis_coverage(conn: sqlite3.Connection, date: datetime) -> Optional[datetime]:
+    """Get the time up to which the stored analysis of a day covers its incidents, None without one."""
+    row = conn.execute(
+        "SELECT covered_until FROM incident_analysis WHERE date = ?", (date.strftime('%Y-%m-%d'),)
+    ).fetchone()
+    if row is None:
+        return None
+    if row['covered_until'] is None:
+        return date.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    return datetime.fromisoformat(row['covered_until'])
+
+def get_slices(conn: sqlite3.Connection, date: datetime) -> Dict[str, sqlite3.Row]:
+    """Get the analyzed slices of a day by their start."""
+    return {
+        row['slice_start']: row
+        for row in conn.execute(
+            "SELECT * FROM analysis_slices WHERE date = ? ORDER BY slice_start", (date.strftime('%Y-%m-%d'),)
+        )
+    }
+
+def store_slice(conn: sqlite3.Connection, slice_start: datetime, incident_count: int, last_incident_id: int,
+                summary: Optional[str] = None, severity: Optional[str] = None,
+                notable_incidents: Optional[List[str]] = None):
+    """Store the analysis of a slice, replacing an earlier one."""
+    with conn:
+        conn.execute("""
+            INSERT OR REPLACE INTO analysis_slices
+            (date, slice_start, incident_count, last_incident_id, summary, severity, notable_incidents)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (
+            slice_start.strftime('%Y-%m-%d'),
+            slice_start,
+            incident_count,
+            last_incident_id,
+            summary,
+            severity,
+            json.dumps(notable_incidents or [])
+        ))
+
+def store_analysis(analysis: 'DailyIncidentAnalysis', covered_until: Optional[datetime] = None):
+    """
+    Store the incident analysis in the database. `covered_until` is the end
+    of the incidents an intra-day analysis covers, None for the whole day.
+    """
+    date_str = analysis.date.strftime('%Y-%m-%d')
+    
+    with get_db_connection() as conn:
+        # Store main analysis
+        conn.execute("""
+        INSERT OR REPLACE INTO incident_analysis 
+        (date, total_incidents, summary, recommendations, covered_until)
+        VALUES (?, ?, ?, ?, ?)
+        """, (
+            date_str,
+            analysis.total_incidents,
+            analysis.summary,
+            json.dumps(analysis.recommendations),
+            covered_until
+        ))
+        
+        # Clear existing highlights and trends for this date
+        conn.execute("DELETE FROM incident_highlights WHERE date = ?", (date_str,))
+        conn.execute("DELETE FROM incident_trends WHERE date = ?", (date_str,))
+        
+        # Store highlights
+        for highlight in analysis.key_highlights:
+            conn.execute("""
+            INSERT INTO incident_highlights 
+            (date, title, description, severity, affected_areas)
+            VALUES (?, ?, ?, ?, ?)
+            """, (
+                date_str,
+                highlight.title,
+                highlight.description,
+                highlight.severity,
+                json.dumps(highlight.affected_areas)
+            ))
+        
+        # Store trends
+        for trend in analysis.identified_trends:
+            conn.execute("""
+            INSERT INTO incident_trends
+            (date, trend_name, description, supporting_evidence)
+            VALUES (?, ?, ?, ?)
+            """, (
+                date_str,
+                trend.trend_name,
+                trend.description,
+                json.dumps(trend.supporting_evidence)
+            ))
+        
+        conn.commit()
+
+def get_stored_analysis(date: datetime) -> Optional[dict]:
+    """Retrieve stored analysis for a given date"""
+    date_str = date.strftime('%Y-%m-%d')
+    
+    with get_db_connection() as conn:
+        # Get main analysis
+        analysis = conn.execute(
+            "SELECT * FROM incident_analysis WHERE date = ?",
+            (date_str,)
+        ).fetchone()
+        
+        if not analysis:
+            return None
+        
+        # Get highlights
+        highlights = conn.execute(
+            "SELECT * FROM incident_highlights WHERE date = ?",
+            (date_str,)
+        ).fetchall()
+        
+        # Get trends
+        trends = conn.execute(
+            "SELECT * FROM incident_trends WHERE date = ?",
+            (date_str,)
+        ).fetchall()
+        
+        return {
+            "date": date_str,
+            "total_incidents": analysis['total_incidents'],
+            "summary": analysis['summary'],
+            "covered_until": analysis['covered_until'],
+            "recommendations": json.loads(analysis['recommendations']),
+            "highlights": [
+                {
+                    "title": h['title'],
+                    "description": h['description'],
+                    "severity": h['severity'],
+                    "affected_areas": json.loads(h['affected_areas'])
+                }
+                for h in highlights
+            ],
+            "trends": [
+                {
+                    "name": t['trend_name'],
+                    "description": t['description'],
+                    "evidence": json.loads(t['supporting_evidence'])
+                }
+                for t in trends
+            ]
+        }
@@ -1,204 +1,99 @@
-from flask import Flask, render_template, jsonify, request
-from datetime import datetime, timedelta
-import sqlite3
-from typing import Dict, List, Optional
+from flask import Flask, Response, make_response, render_template, jsonify, request
+from datetime import datetime, timedelta, timezone
+import json
 import os
-from .ai import get_incident_insights
+import sqlite3
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+from .aggregation import aggregate_day, REGIONS_QUERY
+from .analysis import analysis_checkpoint, get_analysis_coverage, get_stored_analysis
+from .cache import DataCache, get_data_version, get_newest_incident_time, is_closed, make_etag
+from .db import get_db_connection, get_latest_incident_id
+from .jobs import enqueue_analysis, get_job_created, get_latest_job, request_analysis
+from .live import get_feed
+from .search import (build_incidents_count_query, build_incidents_query, decode_cursor, encode_cursor,
+                     incident_to_dict)
 
-# Create the Flask app first
+# Create the Flask app first. The database is prepared by the first get_db_connection()
 app = Flask(__name__)
 
-def get_db_connection():
-    # Get database path from environment variable, fallback to data directory
-    db_path = os.getenv('DB_PATH', os.path.join('data', 'p2000.db'))
-    app.logger.info(f"Connecting to database at: {db_path}")
-    
-    # Ensure the data directory exists
-    os.makedirs(os.path.dirname(db_path), exist_ok=True)
-    
-    conn = sqlite3.connect(db_path)
-    conn.row_factory = sqlite3.Row
-    
-    # Initialize the database tables if they don't exist
-    with conn:
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS incidents (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp DATETIME NOT NULL,
-                service_type TEXT NOT NULL,
-                region TEXT NOT NULL,
-                message TEXT NOT NULL,
-                details TEXT,
-                raw_timestamp TEXT NOT NULL,
-                UNIQUE(timestamp, service_type, region, message)
-            )
-        """)
-    
-    return conn
+# Dashboard data of the popular (date, region) pairs
+data_cache = DataCache()
 
-# Initialize the app
-with app.app_context():
-    # Ensure database and tables exist
-    with get_db_connection() as conn:
-        pass  # The connection function now handles table creation
+# Cache-Control of API responses that can no longer change, and of the others
+CLOSED_CACHE_CONTROL = 'public, max-age=604800'
+OPEN_CACHE_CONTROL = 'no-cache'
+
+# Incident times are stored as naive local times of the P2000 network
+INCIDENT_TIMEZONE = ZoneInfo('Europe/Amsterdam')
+
+# Longest date range /api/incidents accepts
+MAX_RANGE_DAYS = 31
+
+# Largest page /api/incidents returns, and rows per chunk when streaming
+MAX_PAGE_SIZE = 500
+STREAM_CHUNK_SIZE = 200
+
+# Seconds between keepalives on an idle /api/stream, and the reconnect delay clients are told to use
+STREAM_HEARTBEAT = 15
+STREAM_RETRY_MS = 5000
+
+# Base URL of the /api/stream service when it runs separately (gunicorn.stream.conf.py), and the
+# dashboard origin that service allows. Empty serves the stream from this app.
+STREAM_URL = os.getenv('STREAM_URL', '').rstrip('/')
+STREAM_ALLOW_ORIGIN = os.getenv('STREAM_ALLOW_ORIGIN', '')
 
 def get_available_regions() -> List[str]:
     """Get list of all available regions from the database."""
     with get_db_connection() as conn:
-        regions = conn.execute(
-            "SELECT DISTINCT region FROM incidents ORDER BY region"
-        ).fetchall()
+        regions = conn.execute(REGIONS_QUERY).fetchall()
         return [row['region'] for row in regions]
 
+def get_analysis_status(conn: sqlite3.Connection, start_date: datetime) -> str:
+    """
+    Get the analysis status of a day: 'ready' when an analysis is stored,
+    otherwise that of its job (see request_analysis), queueing one if needed.
+    An intra-day analysis behind its checkpoint is queued for an update.
+    Called before reading the data version, which includes the job.
+    """
+    coverage = get_analysis_coverage(conn, start_date)
+    if coverage is None:
+        return request_analysis(conn, start_date)
+    if coverage < analysis_checkpoint(start_date):
+        # Bring an intra-day analysis up to date in the background, the page shows the stored one
+        job = get_latest_job(conn, start_date)
+        if job is None or get_job_created(job) < analysis_checkpoint(start_date):
+            enqueue_analysis(conn, start_date)
+    return 'ready'
+
 def get_data_for_date(date: datetime, region: Optional[str] = None) -> Dict:
-    """Get P2000 data for a specific date and optional region."""
+    """
+    Get P2000 data for a specific date and optional region.
+
+    Results are cached per worker until the day's data version changes.
+    The returned dictionary is shared and must not be modified.
+    """
     start_date = date.replace(hour=0, minute=0, second=0, microsecond=0)
-    end_date = (start_date + timedelta(days=1))
+    key = (start_date.strftime('%Y-%m-%d'), region or None)
+    
+    # Read the version first, changes made while computing invalidate the entry
+    conn = get_db_connection()
+    analysis_status = get_analysis_status(conn, start_date)
+    version = get_data_version(conn, start_date)
+    data = data_cache.get(key, version)
+    if data is not None:
+        return data
     
     with get_db_connection() as conn:
-        # Get all incidents for the day to pass to analysis
-        incidents_query = f"""
-            SELECT * FROM incidents 
-            WHERE timestamp >= ? AND timestamp < ?
-            {' AND region = ?' if region else ''}
-            ORDER BY timestamp
-        """
-        incidents_params = [start_date, end_date]
-        if region:
-            incidents_params.append(region)
-            
-        incidents = [dict(row) for row in conn.execute(incidents_query, incidents_params).fetchall()]
-        
-        # Get AI analysis for the day
-        analysis = get_incident_insights(incidents, start_date)
-        
-        # Build base query parts
-        base_conditions = "timestamp >= ? AND timestamp < ?"
-        base_params = [start_date, end_date]
-        
-        # Add region filter if specified
-        if region:
-            base_conditions += " AND region = ?"
-            base_params.append(region)
-        
-        # Get total incidents
-        total = conn.execute(
-            f"SELECT COUNT(*) as count FROM incidents WHERE {base_conditions}",
-            base_params
-        ).fetchone()['count']
-        
-        # Get service type counts and trends
-        def get_service_count_and_trend(service_type: str) -> Dict:
-            current = conn.execute(
-                f"SELECT COUNT(*) as count FROM incidents WHERE service_type = ? AND {base_conditions}",
-                [service_type] + base_params
-            ).fetchone()['count']
-            
-            previous_start = start_date - timedelta(days=7)
-            previous_params = [service_type, previous_start, start_date]
-            if region:
-                previous_params.append(region)
-            
-            previous = conn.execute(
-                f"SELECT COUNT(*) as count FROM incidents WHERE service_type = ? AND timestamp >= ? AND timestamp < ? {' AND region = ?' if region else ''}",
-                previous_params
-            ).fetchone()['count']
-            
-            previous_daily_avg = previous / 7 if previous > 0 else 1
-            trend_pct = ((current - previous_daily_avg) / previous_daily_avg * 100) if previous_daily_avg > 0 else 0
-            
-            trend = f"+{trend_pct:.0f}%" if trend_pct > 0 else f"{trend_pct:.0f}%" if trend_pct < 0 else "Stable"
-            
-            return {
-                "count": current,
-                "trend": trend
-            }
-        
-        # Get timeline data
-        timeline = {
-            'Ambulance': {},
-            'Politie': {},
-            'Brandweer': {}
-        }
-        for hour in range(24):
-            hour_start = start_date + timedelta(hours=hour)
-            hour_end = hour_start + timedelta(hours=1)
-            hour_key = f"{hour:02d}:00"
-            
-            for service_type in ['Ambulance', 'Politie', 'Brandweer']:
-                hour_params = [service_type, hour_start, hour_end]
-                if region:
-                    hour_params.append(region)
-                
-                count = conn.execute(
-                    f"SELECT COUNT(*) as count FROM incidents WHERE service_type = ? AND timestamp >= ? AND timestamp < ? {' AND region = ?' if region else ''}",
-                    hour_params
-                ).fetchone()['count']
-                timeline[service_type][hour_key] = count
-        
-        # Get category breakdown
-        category_query = f"""
-            SELECT service_type, COUNT(*) as count 
-            FROM incidents 
-            WHERE {base_conditions}
-            GROUP BY service_type
-        """
-        categories = conn.execute(category_query, base_params).fetchall()
-        category_breakdown = {row['service_type']: row['count'] for row in categories}
-        
-        # Get hotspots (regions with most incidents)
-        hotspot_query = f"""
-            SELECT region, COUNT(*) as incidents
-            FROM incidents
-            WHERE {base_conditions}
-            GROUP BY region
-            ORDER BY incidents DESC
-            LIMIT 5
-        """
-        hotspots = conn.execute(hotspot_query, base_params).fetchall()
-        
-        # Get 7-day trend data
-        trend_data = []
-        for i in range(7, -1, -1):
-            day_start = start_date - timedelta(days=i)
-            day_end = day_start + timedelta(days=1)
-            day_params = [day_start, day_end]
-            if region:
-                day_params.append(region)
-            
-            # Get total count and service-specific counts
-            counts = conn.execute(f"""
-                SELECT 
-                    COUNT(*) as total_count,
-                    SUM(CASE WHEN service_type = 'Ambulance' THEN 1 ELSE 0 END) as ambulance_count,
-                    SUM(CASE WHEN service_type = 'Politie' THEN 1 ELSE 0 END) as police_count,
-                    SUM(CASE WHEN service_type = 'Brandweer' THEN 1 ELSE 0 END) as fire_count
-                FROM incidents 
-                WHERE timestamp >= ? AND timestamp < ? {' AND region = ?' if region else ''}
-            """, day_params).fetchone()
-            
-            trend_data.append({
-                'date': day_start.strftime('%Y-%m-%d'),
-                'count': counts['total_count'],
-                'ambulance_count': counts['ambulance_count'],
-                'police_count': counts['police_count'],
-                'fire_count': counts['fire_count']
-            })
-        
-        return {
-            "total_incidents": total,
-            "ambulance": get_service_count_and_trend("Ambulance"),
-            "police": get_service_count_and_trend("Politie"),
-            "fire": get_service_count_and_trend("Brandweer"),
-            "timeline": timeline,
-            "category_breakdown": category_breakdown,
-            "hotspots": [
-                {"location": row['region'], "incidents": row['incidents']}
-                for row in hotspots
-            ],
-            "trend_data": trend_data,
-            "analysis": analysis
-        }
+        data = aggregate_day(conn, start_date, region)
+    
+        # The AI analysis is generated by the worker, never while the page waits
+        analysis = get_stored_analysis(start_date)
+        data["analysis"] = analysis
+        data["analysis_status"] = 'ready' if analysis else analysis_status
+    
+    data_cache.put(key, version, data)
+    return data
 
 @app.route('/')
 def index():
@@ -220,7 +115,8 @@ def index():
                              date=selected_date.strftime('%B %d, %Y'),
                              regions=regions,
                              selected_region=region,
-                             selected_date=selected_date.strftime('%Y-%m-%d'))
+                             selected_date=selected_date.strftime('%Y-%m-%d'),
+                             stream_url=STREAM_URL)
     except sqlite3.OperationalError as e:
         app.logger.error(f"Database error: {str(e)}")
         return render_template('error.html', 
@@ -230,6 +126,27 @@ def index():
         return render_template('error.html', 
                              message="An unexpected error occurred."), 500
 
+def conditional_response(etag: str, closed: bool, last_modified: Optional[datetime],
+                         build: Callable[[], Response]) -> Response:
+    """
+    Answer with a 304 when the client already has `etag`, without calling
+    `build`, otherwise with the response `build` returns. Successful
+    responses get the validators and a Cache-Control that is long for data
+    that can no longer change.
+    """
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = build()
+        if response.status_code != 200:
+            return response
+    
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified.replace(tzinfo=INCIDENT_TIMEZONE).astimezone(timezone.utc)
+    response.headers['Cache-Control'] = CLOSED_CACHE_CONTROL if closed else OPEN_CACHE_CONTROL
+    return response
+
 @app.route('/api/data')
 def get_data():
     date_str = request.args.get('date', (datetime.now() - timedelta(days=1)).strftime('%Y-%m-%d'))
@@ -240,7 +157,18 @@ def get_data():
     except ValueError:
         selected_date = datetime.now() - timedelta(days=1)
     
-    return jsonify(get_data_for_date(selected_date, region))
+    # The validators only need the data version, a 304 skips the aggregation
+    start_date = selected_date.replace(hour=0, minute=0, second=0, microsecond=0)
+    conn = get_db_connection()
+    get_analysis_status(conn, start_date)
+    version = get_data_version(conn, start_date)
+    
+    return conditional_response(
+        make_etag('data', start_date, region or None, version),
+        version is None,
+        get_newest_incident_time(conn, start_date, start_date + timedelta(days=1)),
+        lambda: jsonify(get_data_for_date(selected_date, region))
+    )
 
 @app.route('/health/')
 def health():
@@ -249,72 +177,184 @@ def health():
         # Test database connection
         with get_db_connection() as conn:
             conn.execute('SELECT 1').fetchone()
-        return jsonify({'status': 'healthy'}), 200
+        return jsonify({'status': 'healthy', 'data_cache': data_cache.stats()}), 200
     except Exception as e:
         return jsonify({
             'status': 'unhealthy',
             'error': str(e)
         }), 500
 
+def parse_date_range(default: datetime) -> Tuple[datetime, datetime]:
+    """
+    Get the [start, end) range of the request's `date`, or of its
+    inclusive `from`/`to` dates when searching across several days.
+    """
+    def parse(name: str, fallback: datetime) -> datetime:
+        try:
+            return datetime.strptime(request.args.get(name, ''), '%Y-%m-%d')
+        except ValueError:
+            return fallback
+    
+    selected_date = parse('date', default)
+    start_date = parse('from', selected_date)
+    end_date = parse('to', start_date if 'from' in request.args else selected_date)
+    
+    start_date = start_date.replace(hour=0, minute=0, second=0, microsecond=0)
+    end_date = end_date.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    
+    # Keep the range non-empty and bounded
+    end_date = max(end_date, start_date + timedelta(days=1))
+    start_date = max(start_date, end_date - timedelta(days=MAX_RANGE_DAYS))
+    return start_date, end_date
+
+def stream_incidents(rows: sqlite3.Cursor, next_since: int) -> Iterator[str]:
+    """
+    Yield the {"incidents": [...], "next_since": ...} document of a query
+    chunk by chunk, while SQLite produces the rows, so a whole day is never
+    held in memory.
+    """
+    try:
+        yield '{"incidents": ['
+        separator = ''
+        while True:
+            chunk = rows.fetchmany(STREAM_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield separator + ','.join(json.dumps(incident_to_dict(row)) for row in chunk)
+            separator = ','
+        yield f'], "next_since": {next_since}}}'
+    finally:
+        rows.close()
+
 @app.route('/api/incidents')
 def get_incidents():
-    """API endpoint for fetching filtered incidents."""
+    """
+    API endpoint for fetching filtered incidents, newest first.
+
+    With `limit`, returns one page and the `next_cursor` to pass as `cursor`
+    for the next one (`total` is included on the first page). Without it,
+    all matching incidents are streamed.
+
+    With `since`, returns only the incidents ingested after that id. Full
+    and first page responses carry the `next_since` to start from, delta
+    responses the one to continue with. Incidents ingested while a response
+    is built can be repeated by the next delta, so clients merge by `id`.
+    """
     try:
         # Get query parameters
-        date_str = request.args.get('date', (datetime.now() - timedelta(days=1)).strftime('%Y-%m-%d'))
         service = request.args.get('service', '')
         region = request.args.get('region', '')
         search = request.args.get('search', '')
+        start_date, end_date = parse_date_range(datetime.now() - timedelta(days=1))
+        limit = request.args.get('limit', type=int)
+        cursor = request.args.get('cursor', '')
+        since = request.args.get('since', type=int)
         
-        try:
-            selected_date = datetime.strptime(date_str, '%Y-%m-%d')
-        except ValueError:
-            selected_date = datetime.now() - timedelta(days=1)
-        
-        # Build query conditions
-        conditions = ["timestamp >= ? AND timestamp < ?"]
-        params = [
-            selected_date.replace(hour=0, minute=0, second=0, microsecond=0),
-            selected_date.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
-        ]
+        conn = get_db_connection()
+        # Read before the incidents, so nothing ingested meanwhile is skipped
+        next_since = get_latest_incident_id(conn)
         
-        if service:
-            conditions.append("service_type = ?")
-            params.append(service)
-        
-        if region:
-            conditions.append("region = ?")
-            params.append(region)
-        
-        if search:
-            conditions.append("(message LIKE ? OR details LIKE ?)")
-            search_pattern = f"%{search}%"
-            params.extend([search_pattern, search_pattern])
-        
-        # Construct and execute query
-        query = f"""
-            SELECT timestamp, service_type, region, message, details
-            FROM incidents
-            WHERE {' AND '.join(conditions)}
-            ORDER BY timestamp DESC
-        """
-        
-        with get_db_connection() as conn:
+        def build() -> Response:
+            if since is not None:
+                query, params = build_incidents_query(start_date, end_date, service, region, search,
+                                                      id_range=(since, next_since))
+                incidents = conn.execute(query, params).fetchall()
+                return jsonify({
+                    'incidents': [incident_to_dict(row) for row in incidents],
+                    'next_since': next_since
+                })
+            
+            if not limit:
+                query, params = build_incidents_query(start_date, end_date, service, region, search)
+                # Executed here so query errors are still reported with a 500
+                rows = conn.execute(query, params)
+                return Response(stream_incidents(rows, next_since), mimetype='application/json')
+            
+            page_cursor = decode_cursor(cursor) if cursor else None
+            if cursor and page_cursor is None:
+                return make_response(jsonify({'error': 'Invalid cursor'}), 400)
+            page_size = max(1, min(limit, MAX_PAGE_SIZE))
+            
+            # Fetch one extra row to know whether there is a next page
+            query, params = build_incidents_query(start_date, end_date, service, region, search,
+                                                  page_cursor, page_size + 1)
+            
             incidents = conn.execute(query, params).fetchall()
+            page = {
+                'incidents': [incident_to_dict(row) for row in incidents[:page_size]],
+                'next_cursor': encode_cursor(incidents[page_size - 1]) if len(incidents) > page_size else None
+            }
+            
+            if not page_cursor:
+                count_query, count_params = build_incidents_count_query(start_date, end_date, service,
+                                                                        region, search)
+                page['total'] = conn.execute(count_query, count_params).fetchone()[0]
+                page['next_since'] = next_since
             
-            return jsonify({
-                'incidents': [{
-                    'timestamp': row['timestamp'],
-                    'service_type': row['service_type'],
-                    'region': row['region'],
-                    'message': row['message'],
-                    'details': row['details']
-                } for row in incidents]
-            })
+            return jsonify(page)
+        
+        # Every response carries next_since, so the ETag follows the ingest generation
+        return conditional_response(
+            make_etag('incidents', start_date, end_date, service, region, search, limit, cursor, since,
+                      next_since),
+            is_closed(conn, end_date),
+            get_newest_incident_time(conn, start_date, end_date),
+            build
+        )
             
     except Exception as e:
         app.logger.error(f"Error fetching incidents: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+def stream_events(events: Iterator[Tuple[int, List[Dict]]], matches: Callable[[Dict], bool]) -> Iterator[str]:
+    """Yield the Server-Sent Events of the feed batches, newest incident first."""
+    yield f"retry: {STREAM_RETRY_MS}\n\n"
+    for latest_id, incidents in events:
+        incidents = [incident for incident in reversed(incidents) if matches(incident)]
+        if incidents:
+            data = json.dumps({'incidents': incidents, 'next_since': latest_id})
+            yield f"id: {latest_id}\nevent: incidents\ndata: {data}\n\n"
+        else:
+            # Keeps the connection alive and moves the id a reconnecting client resumes from
+            yield f"id: {latest_id}\n\n"
+
+@app.route('/api/stream')
+def stream():
+    """
+    Server-Sent Events feed of newly ingested incidents, as `incidents`
+    events with the same fields as /api/incidents.
+
+    Optional `service` and `region` filters, and `date` or `from`/`to` to
+    only pass incidents of those days. Starts after `since` (or the
+    Last-Event-ID of a reconnecting client), otherwise at the latest
+    incident, catching up on at most the incidents the feed buffers
+    (see IncidentFeed.follow). Every client holds a connection, so production serves it
+    from the gevent workers of gunicorn.stream.conf.py.
+    """
+    service = request.args.get('service', '')
+    region = request.args.get('region', '')
+    since = request.headers.get('Last-Event-ID', type=int)
+    if since is None:
+        since = request.args.get('since', type=int)
+    
+    start = end = None
+    if any(name in request.args for name in ('date', 'from', 'to')):
+        start_date, end_date = parse_date_range(datetime.now())
+        start, end = str(start_date), str(end_date)
+    
+    def matches(incident: Dict) -> bool:
+        return ((not service or incident['service_type'] == service)
+                and (not region or incident['region'] == region)
+                and (start is None or start <= incident['timestamp'] < end))
+    
+    events = get_feed().follow(since, STREAM_HEARTBEAT)
+    headers = {
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    }
+    if STREAM_ALLOW_ORIGIN:
+        headers['Access-Control-Allow-Origin'] = STREAM_ALLOW_ORIGIN
+    return Response(stream_events(events, matches), mimetype='text/event-stream', headers=headers)
+
 if __name__ == '__main__':
     app.run(debug=True) 
\ No newline at end of file
@@ -0,0 +1,115 @@
+from collections import OrderedDict
+from datetime import datetime, timedelta
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from typing import Dict, Hashable, Optional, Tuple
+
+from .db import get_latest_incident_id
+from .jobs import get_latest_job
+
+# Number of (date, region) entries every worker keeps
+DATA_CACHE_SIZE = int(os.getenv('DATA_CACHE_SIZE', '128'))
+
+class DataCache:
+    """
+    Bounded LRU cache of dashboard data, one per worker process.
+
+    Every entry is stored with the version of the database it was computed
+    from (see get_data_version). An entry stored without a version never
+    expires, the others are only returned while the version is unchanged.
+    Cached values are shared between requests and must not be modified.
+    """
+
+    def __init__(self, maxsize: int = DATA_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, version: Optional[Tuple]) -> Optional[Dict]:
+        """Get the cached value of `key` if it is still valid for `version`."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] is not None and entry[0] != version:
+                self.stale += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, version: Optional[Tuple], value: Dict):
+        """Store the value of `key`, computed from `version` (None if it can no longer change)."""
+        with self.lock:
+            self.entries[key] = (version, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> Dict:
+        """Get the hit/miss counters of the cache."""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self.entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'stale': self.stale,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else None
+            }
+
+def is_closed(conn: sqlite3.Connection, end_date: datetime) -> bool:
+    """
+    Check whether incidents before `end_date` can no longer change: the
+    scraper's watermark is past it and no backfill is running.
+    """
+    state = {
+        row['name']: json.loads(row['value'])
+        for row in conn.execute("SELECT name, value FROM scraper_state WHERE name IN ('watermark', 'backfill')")
+    }
+    watermark = state.get('watermark')
+    return ('backfill' not in state and watermark is not None
+            and datetime.fromisoformat(watermark['timestamp']) >= end_date)
+
+def get_data_version(conn: sqlite3.Connection, start_date: datetime) -> Optional[Tuple]:
+    """
+    Get the version of the database the dashboard data of a day depends on:
+    the ingest generation (last incident id) and the analysis of the day,
+    or the state of its analysis job while there is none.
+
+    Returns None once the day is closed (see is_closed) and has an
+    analysis of the whole day, so nothing can change the day or the trend
+    window before it. An intra-day analysis will still be replaced.
+    """
+    analysis = conn.execute(
+        "SELECT rowid, covered_until FROM incident_analysis WHERE date = ?", (start_date.strftime('%Y-%m-%d'),)
+    ).fetchone()
+    if analysis:
+        if analysis['covered_until'] is None and is_closed(conn, start_date + timedelta(days=1)):
+            return None
+        return get_latest_incident_id(conn), analysis['rowid'], analysis['covered_until']
+
+    job = get_latest_job(conn, start_date)
+    return get_latest_incident_id(conn), None, (job['id'], job['status']) if job else None
+
+def get_newest_incident_time(conn: sqlite3.Connection, start_date: datetime, end_date: datetime) -> Optional[datetime]:
+    """Get the timestamp of the newest incident in [start_date, end_date), if any."""
+    row = conn.execute(
+        "SELECT MAX(timestamp) FROM incidents WHERE timestamp >= ? AND timestamp < ?", (start_date, end_date)
+    ).fetchone()
+    return datetime.fromisoformat(row[0]) if row[0] else None
+
+def make_etag(*parts) -> str:
+    """Get a strong ETag identifying a response by the parts it depends on."""
+    return hashlib.sha1(json.dumps(parts, default=str).encode()).hexdigest()
@@ -1,21 +1,16 @@
 import click
 from datetime import datetime, timedelta
-import sqlite3
-from typing import Dict, List
+import logging
 import os
-from .ai import get_incident_insights
+from typing import Dict, List
+from .db import get_db_connection
+from .search import build_incidents_count_query, build_incidents_query
 from rich.console import Console
 from rich.table import Table
 from rich import box
 
 console = Console()
 
-def get_db_connection():
-    db_path = os.path.join('data', 'p2000.db')
-    conn = sqlite3.connect(db_path)
-    conn.row_factory = sqlite3.Row
-    return conn
-
 def get_incidents_for_date(date: datetime) -> List[Dict]:
     """Get all incidents for a specific date."""
     start_date = date.replace(hour=0, minute=0, second=0, microsecond=0)
@@ -46,15 +41,23 @@ def get_incidents_for_date(date: datetime) -> List[Dict]:
 @click.group()
 def cli():
     """Command line interface for Emergency NL analysis."""
-    pass
+    logging.basicConfig(
+        level=os.getenv('LOG_LEVEL', 'info').upper(),
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
 
 @cli.command()
 @click.option('--date', '-d', default=None, 
               help='Date to analyze in YYYY-MM-DD format. Defaults to yesterday.')
 @click.option('--force', '-f', is_flag=True, 
               help='Force re-analysis even if already exists.')
-def analyze(date: str, force: bool):
+@click.option('--no-cache', is_flag=True,
+              help='Call the model even for requests with a cached response.')
+def analyze(date: str, force: bool, no_cache: bool):
     """Run AI analysis for incidents on a specific date."""
+    if no_cache:
+        from . import ai
+        ai.cache_enabled = False
     try:
         if date:
             analysis_date = datetime.strptime(date, '%Y-%m-%d')
@@ -69,6 +72,7 @@ def analyze(date: str, force: bool):
                 return
                 
             # Run analysis
+            from .ai import get_incident_insights
             stored_analysis = get_incident_insights(incidents, analysis_date)
             
             # If analysis exists and force flag not set, use existing analysis
@@ -152,10 +156,281 @@ def analyze(date: str, force: bool):
             for i, rec in enumerate(analysis['recommendations'], 1):
                 console.print(f"{i}. {rec}")
             
+            print_cache_stats()
+            
     except ValueError as e:
         console.print(f"[red]Error: Invalid date format. Please use YYYY-MM-DD[/red]")
     except Exception as e:
         console.print(f"[red]Error: {str(e)}[/red]")
 
+@cli.command('enqueue-analysis')
+@click.option('--date', '-d', default=None,
+              help='Date to analyze in YYYY-MM-DD format. Defaults to yesterday.')
+@click.option('--force', '-f', is_flag=True,
+              help='Force re-analysis even if already exists.')
+def enqueue_analysis_command(date: str, force: bool):
+    """Queue AI analysis of a date for the background worker."""
+    from .jobs import enqueue_analysis
+    
+    try:
+        analysis_date = datetime.strptime(date, '%Y-%m-%d') if date else datetime.now() - timedelta(days=1)
+    except ValueError:
+        console.print(f"[red]Error: Invalid date format. Please use YYYY-MM-DD[/red]")
+        return
+    
+    if enqueue_analysis(get_db_connection(), analysis_date, force):
+        console.print(f"[green]Queued analysis of {analysis_date.strftime('%Y-%m-%d')}[/green]")
+    else:
+        console.print(f"[yellow]Analysis of {analysis_date.strftime('%Y-%m-%d')} is already queued[/yellow]")
+
+@cli.command()
+@click.option('--interval', '-i', default=5.0, type=float,
+              help='Seconds between checks of an empty queue.')
+@click.option('--once', is_flag=True,
+              help='Exit when the queue is empty.')
+@click.option('--no-cache', is_flag=True,
+              help='Call the model even for requests with a cached response.')
+def worker(interval: float, once: bool, no_cache: bool):
+    """Run queued AI analysis jobs."""
+    from .jobs import run_worker
+    
+    if no_cache:
+        from . import ai
+        ai.cache_enabled = False
+    console.print("[bold blue]Waiting for analysis jobs...[/bold blue]")
+    try:
+        processed = run_worker(interval, once)
+    except KeyboardInterrupt:
+        return
+    console.print(f"[green]Processed {processed} jobs[/green]")
+    print_cache_stats()
+
+@cli.command('analyze-range')
+@click.option('--from', 'first', required=True,
+              help='First date to analyze in YYYY-MM-DD format.')
+@click.option('--to', 'last', default=None,
+              help='Last date to analyze in YYYY-MM-DD format. Defaults to yesterday.')
+@click.option('--concurrency', '-c', default=4, type=int,
+              help='Dates analyzed at the same time.')
+@click.option('--rate', default=None, type=float,
+              help='LLM requests per second across all dates. Defaults to LLM_RATE_LIMIT.')
+@click.option('--force', '-f', is_flag=True,
+              help='Force re-analysis of dates that are already analyzed.')
+@click.option('--no-cache', is_flag=True,
+              help='Call the model even for requests with a cached response.')
+def analyze_range(first: str, last: str, concurrency: int, rate: float, force: bool, no_cache: bool):
+    """Analyze a range of dates concurrently, resuming an interrupted run."""
+    from . import ai
+    from .jobs import queue_range, run_range
+    from .ratelimit import TokenBucket
+
+    try:
+        first_date = datetime.strptime(first, '%Y-%m-%d')
+        last_date = datetime.strptime(last, '%Y-%m-%d') if last else \
+            (datetime.now() - timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    except ValueError:
+        console.print(f"[red]Error: Invalid date format. Please use YYYY-MM-DD[/red]")
+        return
+
+    if no_cache:
+        ai.cache_enabled = False
+    if rate:
+        ai.rate_limiter = TokenBucket(rate)
+
+    queued = queue_range(get_db_connection(), first_date, last_date, force)
+    if queued['resumed']:
+        console.print(f"[yellow]Resuming {queued['resumed']} queued dates[/yellow]")
+    console.print(f"[bold blue]Analyzing {queued['queued'] + queued['resumed']} dates "
+                  f"({queued['skipped']} already analyzed) with concurrency {concurrency}...[/bold blue]")
+
+    started = datetime.now()
+    try:
+        results = run_range(first_date, last_date, concurrency)
+    except KeyboardInterrupt:
+        console.print("[yellow]Interrupted, run the same command again"
+                      + (" without --force" if force else "") + " to resume[/yellow]")
+        return
+    elapsed = (datetime.now() - started).total_seconds()
+    usage = ai.get_usage_summary()
+
+    table = Table(title=f"Analysis {first_date.strftime('%Y-%m-%d')} to {last_date.strftime('%Y-%m-%d')}",
+                  box=box.ROUNDED)
+    table.add_column("Metric")
+    table.add_column("Value", justify="right")
+    table.add_row("Dates analyzed", str(results['stored']))
+    table.add_row("Dates already analyzed", str(queued['skipped']))
+    table.add_row("Dates with nothing new to analyze", str(results['skipped']))
+    table.add_row("Dates failed", str(results['failed']))
+    table.add_row("Wall time", f"{elapsed:.1f}s")
+    table.add_row("Dates per minute", f"{results['stored'] * 60 / elapsed:.1f}" if elapsed else "-")
+    table.add_row("LLM requests", f"{usage['calls']} ({usage['retries']} retries)")
+    table.add_row("LLM requests per second", f"{usage['calls'] / elapsed:.2f}" if elapsed else "-")
+    table.add_row("Prompt tokens", f"{usage['prompt_tokens']:,}")
+    table.add_row("Completion tokens", f"{usage['completion_tokens']:,}")
+    table.add_row("Estimated cost", f"${usage['cost']:.4f}")
+    console.print(table)
+    print_cache_stats()
+
+def percentile(values: List[float], share: float) -> float:
+    """Get the nearest-rank percentile of sorted values."""
+    return values[min(len(values) - 1, int(round(share * (len(values) - 1))))]
+
+@cli.command('llm-report')
+@click.option('--days', default=14, type=int,
+              help='Days of LLM calls to report on.')
+def llm_report(days: int):
+    """Show LLM latency, token usage and spend per day and per request type."""
+    with get_db_connection() as conn:
+        calls = conn.execute("""
+            SELECT date(created_at, 'localtime') AS day, response_model, outcome, prompt_tokens,
+                   completion_tokens, cost, latency_ms, retries
+            FROM llm_calls
+            WHERE created_at >= datetime('now', ?)
+            ORDER BY day
+        """, (f'-{days} days',)).fetchall()
+    if not calls:
+        console.print(f"[yellow]No LLM calls in the last {days} days[/yellow]")
+        return
+
+    for title, group in (("Day", 'day'), ("Request", 'response_model')):
+        groups = {}
+        for call in calls:
+            groups.setdefault(call[group], []).append(call)
+
+        table = Table(title=f"LLM Calls per {title}", box=box.ROUNDED)
+        table.add_column(title)
+        for column in ("Calls", "Cached", "Errors", "Retries", "Prompt", "Completion", "p50 ms", "p95 ms", "Spend"):
+            table.add_column(column, justify="right")
+        for name, group_calls in groups.items():
+            requested = [call for call in group_calls if call['outcome'] != 'cached']
+            latencies = sorted(call['latency_ms'] for call in requested if call['outcome'] == 'ok')
+            table.add_row(
+                name,
+                str(len(requested)),
+                str(len(group_calls) - len(requested)),
+                str(sum(call['outcome'] == 'error' for call in requested)),
+                str(sum(call['retries'] for call in requested)),
+                f"{sum(call['prompt_tokens'] for call in requested):,}",
+                f"{sum(call['completion_tokens'] for call in requested):,}",
+                f"{percentile(latencies, 0.5):.0f}" if latencies else "-",
+                f"{percentile(latencies, 0.95):.0f}" if latencies else "-",
+                f"${sum(call['cost'] for call in requested):.4f}"
+            )
+        console.print(table)
+    console.print(f"[dim]{len(calls)} calls in the last {days} days, "
+                  f"${sum(call['cost'] for call in calls):.4f} estimated spend[/dim]")
+
+def print_cache_stats():
+    """Print the LLM response cache lookups of this process."""
+    from .ai import get_cache_summary
+    
+    stats = get_cache_summary()
+    if stats['enabled'] and stats['hits'] + stats['misses']:
+        console.print(f"[dim]LLM cache: {stats['hits']} hits, {stats['misses']} misses "
+                      f"({stats['hit_rate']:.0%} hit rate)[/dim]")
+
+@cli.command('llm-cache')
+@click.option('--clear', is_flag=True, help='Delete every cached response.')
+def llm_cache_command(clear: bool):
+    """Show the size of the LLM response cache."""
+    from .ai import get_cache_summary
+    
+    if clear:
+        with get_db_connection() as conn:
+            deleted = conn.execute("DELETE FROM llm_cache").rowcount
+        console.print(f"[green]Deleted {deleted} cached responses[/green]")
+        return
+    
+    stats = get_cache_summary()
+    table = Table(title="LLM Response Cache", box=box.ROUNDED)
+    table.add_column("Entries", justify="right")
+    table.add_column("Size", justify="right")
+    table.add_column("Limit", justify="right")
+    table.add_column("Hits", justify="right")
+    table.add_row(str(stats['entries']), f"{stats['size'] / 1024:.1f} KiB",
+                  f"{stats['max_size'] / 1024 / 1024:.0f} MiB", str(stats['total_hits']))
+    console.print(table)
+    if not stats['enabled']:
+        console.print("[yellow]The cache is disabled (LLM_CACHE=0)[/yellow]")
+
+@cli.command('rebuild-rollups')
+def rebuild_rollups_command():
+    """Rebuild the hourly rollup table from the raw incidents."""
+    from .aggregation import rebuild_rollups
+    
+    with console.status("[bold blue]Rebuilding hourly rollups..."):
+        rows = rebuild_rollups(get_db_connection())
+    console.print(f"[green]Rebuilt hourly rollups: {rows} rows[/green]")
+
+@cli.command('rebuild-search-index')
+def rebuild_search_index_command():
+    """Rebuild the full-text search index from the raw incidents."""
+    from .search import rebuild_search_index
+    
+    with console.status("[bold blue]Rebuilding search index..."):
+        rebuild_search_index(get_db_connection())
+    console.print("[green]Rebuilt search index[/green]")
+
+@cli.command('check-indexes')
+@click.option('--date', '-d', default=None,
+              help='Date to build the queries for in YYYY-MM-DD format. Defaults to yesterday.')
+def check_indexes(date: str):
+    """Check with EXPLAIN QUERY PLAN that every dashboard query uses an index."""
+    from .aggregation import dashboard_queries, REGIONS_QUERY
+    from .db import explain_query_plan, full_table_scans
+    
+    check_date = datetime.strptime(date, '%Y-%m-%d') if date else datetime.now() - timedelta(days=1)
+    start_date = check_date.replace(hour=0, minute=0, second=0, microsecond=0)
+    end_date = start_date + timedelta(days=1)
+    
+    with get_db_connection() as conn:
+        row = conn.execute("SELECT region FROM incidents LIMIT 1").fetchone()
+        region = row['region'] if row else 'Utrecht'
+        
+        queries = [("regions", REGIONS_QUERY, [])]
+        for query_region in (None, region):
+            suffix = f" ({query_region})" if query_region else ""
+            queries += [
+                (name + suffix, sql, params)
+                for name, sql, params in dashboard_queries(start_date, query_region)
+            ]
+            queries.append(("incidents" + suffix, *build_incidents_query(start_date, end_date, region=query_region or '')))
+        queries.append(("incidents (service, search)", *build_incidents_query(start_date, end_date, 'Ambulance', '', 'A1')))
+        queries.append(("incidents (week, search)", *build_incidents_query(
+            start_date - timedelta(days=6), end_date, search='"brand woning"'
+        )))
+        queries.append(("incidents (page)", *build_incidents_query(
+            start_date, end_date, cursor=(str(start_date + timedelta(hours=12)), 0), limit=25
+        )))
+        queries.append(("incidents (region page)", *build_incidents_query(
+            start_date, end_date, region=region, cursor=(str(start_date + timedelta(hours=12)), 0), limit=25
+        )))
+        queries.append(("incidents count", *build_incidents_count_query(start_date, end_date, 'Ambulance')))
+        queries.append(("incidents (since)", *build_incidents_query(
+            start_date, end_date, region=region, search='A1', id_range=(0, 100)
+        )))
+        
+        table = Table(title="Dashboard query plans", box=box.ROUNDED)
+        table.add_column("Query", style="cyan")
+        table.add_column("Index", style="bold")
+        table.add_column("Plan")
+        
+        failed = False
+        for name, sql, params in queries:
+            plan = explain_query_plan(conn, sql, params)
+            scans = full_table_scans(plan)
+            failed = failed or bool(scans)
+            table.add_row(
+                name,
+                "[red]no[/red]" if scans else "[green]yes[/green]",
+                "\n".join(plan)
+            )
+    
+    console.print(table)
+    if failed:
+        console.print("[red]Some queries scan a table without an index.[/red]")
+        raise SystemExit(1)
+    console.print("[green]All dashboard queries use an index.[/green]")
+
 if __name__ == '__main__':
     cli() 
\ No newline at end of file
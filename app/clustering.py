@@ -0,0 +1,141 @@
+from collections import Counter, defaultdict
+import re
+import sqlite3
+from typing import Dict, List, Sequence
+import zlib
+
+import numpy as np
+
+# MinHash signature length, split into LSH bands: templates whose signatures agree on all
+# rows of any band are candidates, which happens mostly above a Jaccard similarity of ~0.6
+NUM_PERMUTATIONS = 32
+BANDS = 8
+
+# Prime just above 2^32, a * x + b stays within uint64 for 32-bit a, b and x
+PRIME = 4294967311
+SEED = 2000
+
+# Numbers of 3 or more digits (ride numbers, capcodes, house numbers) vary per message,
+# shorter ones are part of the message type (A1, P 1, BDH-01)
+_NUMBERS = re.compile(r'\d{3,}')
+
+def message_template(message: str) -> str:
+    """Get the template of a message: long numbers become #."""
+    return ' '.join(_NUMBERS.sub('#', message).split())
+
+def shingles(template: str) -> List[int]:
+    """
+    Get the hashed word unigrams and bigrams of a template. Every shingle is
+    prefixed with the first word (the message type, such as A1 or PRIO), so
+    templates of different types never match.
+    """
+    words = template.lower().split() or ['']
+    tokens = set(words) | {f"{first} {second}" for first, second in zip(words, words[1:])}
+    return [zlib.crc32(f"{words[0]}|{token}".encode()) for token in tokens]
+
+def minhash_signatures(templates: Sequence[str]) -> np.ndarray:
+    """Get the (len(templates), NUM_PERMUTATIONS) MinHash signatures of templates."""
+    tokens = [shingles(template) for template in templates]
+    lengths = np.fromiter((len(t) for t in tokens), dtype=np.int64, count=len(tokens))
+    hashed = np.fromiter((h for t in tokens for h in t), dtype=np.uint64, count=int(lengths.sum()))
+
+    rng = np.random.default_rng(SEED)
+    a = rng.integers(1, 2 ** 32, NUM_PERMUTATIONS, dtype=np.uint64)
+    b = rng.integers(0, 2 ** 32, NUM_PERMUTATIONS, dtype=np.uint64)
+    permuted = (hashed[None, :] * a[:, None] + b[:, None]) % np.uint64(PRIME)
+
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    return np.minimum.reduceat(permuted, starts, axis=1).T
+
+def lsh_leaders(signatures: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """
+    Get the leader of every signature: the heaviest signature it shares an
+    LSH band with (possibly itself). Leaders are not chained, so a series of
+    slightly different messages never collapses into one group.
+    """
+    order = np.argsort(-weights, kind='stable')
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order))
+
+    rows = NUM_PERMUTATIONS // BANDS
+    best = rank.copy()
+    for band in range(BANDS):
+        bucket = np.unique(signatures[:, band * rows:(band + 1) * rows], axis=0, return_inverse=True)[1].ravel()
+        smallest = np.full(bucket.max() + 1, len(order))
+        np.minimum.at(smallest, bucket, rank)
+        best = np.minimum(best, smallest[bucket])
+    return order[best]
+
+def pattern_text(variants: Sequence[str], counts: Sequence[int]) -> str:
+    """
+    Get the text of a pattern: its most common template, with the words
+    fewer than half of its messages share replaced by *.
+    """
+    total = sum(counts)
+    words = Counter()
+    for template, count in zip(variants, counts):
+        for word in set(template.split()):
+            words[word] += count
+
+    text = []
+    for word in variants[int(np.argmax(counts))].split():
+        word = word if words[word] * 2 >= total else '*'
+        if word != '*' or not text or text[-1] != '*':
+            text.append(word)
+    return ' '.join(text)
+
+def cluster_messages(incidents: Sequence[sqlite3.Row]) -> List[Dict]:
+    """
+    Group near-duplicate messages into patterns.
+
+    Messages are reduced to templates first, so only the distinct templates
+    are hashed. Returns the patterns, most incidents first, with their text
+    (see pattern_text), number of template variants, incident count, peak
+    hours and (region, count) pairs, busiest first.
+    """
+    if not incidents:
+        return []
+
+    template_ids = {}
+    incident_templates = np.fromiter(
+        (template_ids.setdefault(message_template(row['message']), len(template_ids)) for row in incidents),
+        dtype=np.int64, count=len(incidents)
+    )
+    templates = list(template_ids)
+    template_counts = np.bincount(incident_templates, minlength=len(templates))
+    template_labels = lsh_leaders(minhash_signatures(templates), template_counts)
+    labels = template_labels[incident_templates]
+
+    hours = np.fromiter((int(row['timestamp'][11:13]) for row in incidents), dtype=np.int64, count=len(incidents))
+    hour_counts = np.bincount(labels * 24 + hours, minlength=len(templates) * 24).reshape(-1, 24)
+    counts = np.bincount(labels, minlength=len(templates))
+
+    regions = defaultdict(Counter)
+    for label, row in zip(labels.tolist(), incidents):
+        regions[label][row['region']] += 1
+
+    members = defaultdict(list)
+    for template, label in enumerate(template_labels.tolist()):
+        members[label].append(template)
+
+    # Groups of different leaders can end up with the same text, those are merged
+    groups = defaultdict(list)
+    for label in np.flatnonzero(counts).tolist():
+        variants = members[label]
+        text = pattern_text([templates[t] for t in variants], [int(template_counts[t]) for t in variants])
+        groups[text].append(label)
+
+    patterns = []
+    for text, group in groups.items():
+        group_hours = hour_counts[group].sum(axis=0)
+        group_regions = sum((regions[label] for label in group), Counter())
+        busiest_hours = np.argsort(-group_hours, kind='stable')[:3]
+        patterns.append({
+            'template': text,
+            'variants': sum(len(members[label]) for label in group),
+            'count': int(counts[group].sum()),
+            'peak_hours': [int(hour) for hour in busiest_hours if group_hours[hour]],
+            'regions': group_regions.most_common()
+        })
+    patterns.sort(key=lambda pattern: -pattern['count'])
+    return patterns
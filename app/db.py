@@ -0,0 +1,341 @@
+import logging
+import os
+import sqlite3
+import threading
+from typing import Callable, List, Optional
+
+# Applied to every connection. WAL lets the scraper write while the web
+# workers read, busy_timeout makes a blocked writer wait instead of
+# failing with "database is locked".
+PRAGMAS = {
+    'busy_timeout': 5000,
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -16000,  # KiB
+    'temp_store': 'MEMORY'
+}
+
+_local = threading.local()
+_initialized = set()
+_init_lock = threading.Lock()
+
+def get_db_path() -> str:
+    """Get database path from environment variable, fallback to data directory."""
+    return os.getenv('DB_PATH', os.path.join('data', 'p2000.db'))
+
+def connect(db_path: Optional[str] = None) -> sqlite3.Connection:
+    """Open a new tuned connection. Prefer get_db_connection()."""
+    conn = sqlite3.connect(db_path or get_db_path())
+    conn.row_factory = sqlite3.Row
+    for name, value in PRAGMAS.items():
+        conn.execute(f"PRAGMA {name} = {value}")
+    return conn
+
+def get_db_connection(db_path: Optional[str] = None) -> sqlite3.Connection:
+    """
+    Get the connection of the current thread, opening it on first use.
+
+    Connections are kept open for the lifetime of the thread and are not
+    shared across threads or forked processes. Using the connection as a
+    context manager commits or rolls back, it does not close it.
+    """
+    db_path = db_path or get_db_path()
+    init_db(db_path)
+
+    if getattr(_local, 'pid', None) != os.getpid():
+        # Never reuse connections inherited from a parent process
+        _local.pid = os.getpid()
+        _local.connections = {}
+
+    conn = _local.connections.get(db_path)
+    if conn is None:
+        conn = connect(db_path)
+        _local.connections[db_path] = conn
+    return conn
+
+def close_db_connection(db_path: Optional[str] = None):
+    """Close the current thread's connection, if it has one."""
+    if getattr(_local, 'pid', None) != os.getpid():
+        return
+    conn = _local.connections.pop(db_path or get_db_path(), None)
+    if conn is not None:
+        conn.close()
+
+def add_column(table: str, column: str, definition: str) -> Callable[[sqlite3.Connection], None]:
+    """Get a migration step adding a column unless the table has it already."""
+    def step(conn: sqlite3.Connection):
+        columns = {row['name'] for row in conn.execute(f"PRAGMA table_info({table})")}
+        if column not in columns:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+    return step
+
+# Schema migrations as (version, description, statements), where a statement
+# is SQL or a function of the connection (see add_column). Every step must
+# be idempotent: databases created before versioning already have some of
+# these tables, and a failed migration may be run again.
+MIGRATIONS = [
+    (1, "incidents and scraper state", [
+        """
+        CREATE TABLE IF NOT EXISTS incidents (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp DATETIME NOT NULL,
+            service_type TEXT NOT NULL,
+            region TEXT NOT NULL,
+            message TEXT NOT NULL,
+            details TEXT,
+            raw_timestamp TEXT NOT NULL,
+            UNIQUE(timestamp, service_type, region, message)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS scraper_state (
+            name TEXT PRIMARY KEY,
+            value TEXT NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    ]),
+    (2, "incident analysis", [
+        """
+        CREATE TABLE IF NOT EXISTS incident_analysis (
+            date TEXT PRIMARY KEY,
+            total_incidents INTEGER,
+            summary TEXT,
+            recommendations TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS incident_highlights (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            date TEXT,
+            title TEXT,
+            description TEXT,
+            severity TEXT,
+            affected_areas TEXT,
+            FOREIGN KEY (date) REFERENCES incident_analysis(date)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS incident_trends (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            date TEXT,
+            trend_name TEXT,
+            description TEXT,
+            supporting_evidence TEXT,
+            FOREIGN KEY (date) REFERENCES incident_analysis(date)
+        )
+        """
+    ]),
+    (3, "indexes for the dashboard queries", [
+        # Day ranges grouped by hour, service type or region
+        """
+        CREATE INDEX IF NOT EXISTS idx_incidents_timestamp_service_region
+        ON incidents(timestamp, service_type, region)
+        """,
+        # Region-filtered day ranges and the list of regions
+        """
+        CREATE INDEX IF NOT EXISTS idx_incidents_region_timestamp
+        ON incidents(region, timestamp, service_type)
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_incident_highlights_date ON incident_highlights(date)",
+        "CREATE INDEX IF NOT EXISTS idx_incident_trends_date ON incident_trends(date)",
+        "ANALYZE"
+    ]),
+    (4, "hourly incident rollups", [
+        """
+        CREATE TABLE IF NOT EXISTS incident_rollups_hourly (
+            hour TEXT NOT NULL,
+            service_type TEXT NOT NULL,
+            region TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (hour, service_type, region)
+        ) WITHOUT ROWID
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS idx_incident_rollups_hourly_region
+        ON incident_rollups_hourly(region, hour, service_type, count)
+        """,
+        "DELETE FROM incident_rollups_hourly",
+        """
+        INSERT INTO incident_rollups_hourly (hour, service_type, region, count)
+        SELECT strftime('%Y-%m-%d %H:00:00', timestamp), service_type, region, COUNT(*)
+        FROM incidents
+        GROUP BY 1, 2, 3
+        """
+    ]),
+    (5, "full-text search index", [
+        # External content table: only the index is stored, the text stays
+        # in incidents. Prefix indexes make prefix queries cheap.
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS incidents_fts USING fts5(
+            message,
+            details,
+            content = 'incidents',
+            content_rowid = 'id',
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3'
+        )
+        """,
+        "INSERT INTO incidents_fts (incidents_fts) VALUES ('rebuild')"
+    ]),
+    (6, "analysis job queue", [
+        """
+        CREATE TABLE IF NOT EXISTS analysis_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            date TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            force INTEGER NOT NULL DEFAULT 0,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            error TEXT,
+            run_after TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            started_at TIMESTAMP,
+            finished_at TIMESTAMP
+        )
+        """,
+        # At most one unfinished job per date, this deduplicates requests
+        """
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_analysis_jobs_active_date
+        ON analysis_jobs(date) WHERE status IN ('pending', 'running')
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_analysis_jobs_date ON analysis_jobs(date, id)",
+        "CREATE INDEX IF NOT EXISTS idx_analysis_jobs_status ON analysis_jobs(status, run_after)"
+    ]),
+    (7, "LLM response cache", [
+        """
+        CREATE TABLE IF NOT EXISTS llm_cache (
+            key TEXT PRIMARY KEY,
+            model TEXT NOT NULL,
+            response TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            hits INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_used_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_llm_cache_last_used ON llm_cache(last_used_at)"
+    ]),
+    (8, "intra-day analysis slices", [
+        # NULL for analyses of the whole day
+        add_column('incident_analysis', 'covered_until', 'TIMESTAMP'),
+        """
+        CREATE TABLE IF NOT EXISTS analysis_slices (
+            date TEXT NOT NULL,
+            slice_start TIMESTAMP NOT NULL,
+            incident_count INTEGER NOT NULL,
+            last_incident_id INTEGER NOT NULL,
+            summary TEXT,
+            severity TEXT,
+            notable_incidents TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (date, slice_start)
+        )
+        """
+    ]),
+    (9, "LLM call log", [
+        """
+        CREATE TABLE IF NOT EXISTS llm_calls (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            date TEXT,
+            model TEXT NOT NULL,
+            response_model TEXT NOT NULL,
+            outcome TEXT NOT NULL CHECK (outcome IN ('ok', 'cached', 'error')),
+            prompt_tokens INTEGER NOT NULL DEFAULT 0,
+            completion_tokens INTEGER NOT NULL DEFAULT 0,
+            cost REAL NOT NULL DEFAULT 0,
+            latency_ms REAL,
+            total_ms REAL NOT NULL,
+            retries INTEGER NOT NULL DEFAULT 0,
+            error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_llm_calls_created ON llm_calls(created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_llm_calls_date ON llm_calls(date)"
+    ])
+]
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    """Get the version of the last applied migration, 0 for a new database."""
+    conn.execute("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)")
+    row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return row[0] or 0
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """
+    Apply pending migrations, each in its own transaction.
+    Returns the resulting schema version.
+    """
+    version = get_schema_version(conn)
+    conn.commit()
+
+    for step, description, statements in MIGRATIONS:
+        if step <= version:
+            continue
+
+        # Take the write lock first, another process may be migrating too
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if get_schema_version(conn) < step:
+                logging.getLogger(__name__).info(f"Applying migration {step}: {description}")
+                for statement in statements:
+                    if callable(statement):
+                        statement(conn)
+                    else:
+                        conn.execute(statement)
+                conn.execute("INSERT INTO schema_version (version) VALUES (?)", (step,))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        version = step
+
+    return version
+
+def get_latest_incident_id(conn: sqlite3.Connection) -> int:
+    """
+    Get the id of the last ingested incident, 0 if there are none. Ids only
+    grow, so this doubles as the ingest sequence number.
+    """
+    return conn.execute("SELECT COALESCE(MAX(id), 0) FROM incidents").fetchone()[0]
+
+def explain_query_plan(conn: sqlite3.Connection, sql: str, params=()) -> List[str]:
+    """Get the EXPLAIN QUERY PLAN details of a query."""
+    return [row['detail'] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+
+def full_table_scans(plan: List[str]) -> List[str]:
+    """Get the steps of a query plan that scan a table without an index."""
+    return [
+        step for step in plan
+        if step.startswith('SCAN ') and ' USING ' not in step
+        and ' VIRTUAL TABLE INDEX ' not in step
+        and not step.startswith(('SCAN CONSTANT ROW', 'SCAN (subquery'))
+    ]
+
+def init_db(db_path: Optional[str] = None):
+    """
+    Prepare the database once per process: create the data directory,
+    switch to WAL and apply pending migrations.
+    """
+    db_path = db_path or get_db_path()
+    if db_path in _initialized:
+        return
+
+    with _init_lock:
+        if db_path in _initialized:
+            return
+
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+
+        conn = connect(db_path)
+        try:
+            # journal_mode is persistent, but needs to be set by one connection
+            conn.execute("PRAGMA journal_mode = WAL")
+            migrate(conn)
+        finally:
+            conn.close()
+
+        logging.getLogger(__name__).info(f"Database ready at: {db_path}")
+        _initialized.add(db_path)
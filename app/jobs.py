@@ -0,0 +1,279 @@
+from datetime import datetime, timedelta, timezone
+import logging
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from .analysis import analysis_checkpoint, get_analysis_coverage, get_slices, store_analysis
+from .db import get_db_connection
+
+# Attempts before a job is marked as failed, and the delay before retrying (times the attempts)
+MAX_ATTEMPTS = 3
+RETRY_DELAY = 60
+
+# Seconds after which a running job is considered abandoned by its worker
+JOB_TIMEOUT = 15 * 60
+
+logger = logging.getLogger(__name__)
+
+def enqueue_analysis(conn: sqlite3.Connection, date: datetime, force: bool = False) -> bool:
+    """
+    Queue the analysis of a date, unless a job for it is already queued or
+    running. `force` regenerates an existing analysis. Returns whether a new
+    job was created.
+    """
+    date_str = date.strftime('%Y-%m-%d')
+    with conn:
+        created = conn.execute(
+            "INSERT OR IGNORE INTO analysis_jobs (date, force) VALUES (?, ?)", (date_str, int(force))
+        ).rowcount == 1
+        if force and not created:
+            conn.execute("UPDATE analysis_jobs SET force = 1 WHERE date = ? AND status = 'pending'", (date_str,))
+    return created
+
+def get_latest_job(conn: sqlite3.Connection, date: datetime) -> Optional[sqlite3.Row]:
+    """Get the most recent analysis job of a date, if any."""
+    return conn.execute(
+        "SELECT id, status, attempts, error, created_at FROM analysis_jobs WHERE date = ? ORDER BY id DESC LIMIT 1",
+        (date.strftime('%Y-%m-%d'),)
+    ).fetchone()
+
+def get_job_created(job: sqlite3.Row) -> datetime:
+    """Get the local time a job was created at, SQLite stores UTC but incident times are local."""
+    created = datetime.fromisoformat(job['created_at']).replace(tzinfo=timezone.utc)
+    return created.astimezone().replace(tzinfo=None)
+
+def request_analysis(conn: sqlite3.Connection, date: datetime) -> str:
+    """
+    Get the analysis status of a date that has no stored analysis, queueing
+    a job the first time it is requested.
+
+    Returns 'pending', 'running', 'failed', or 'unavailable' when a job
+    finished without producing an analysis (a day without incidents) or
+    the date is in the future. A day still running is queued again once
+    a new slice of it completes, as incidents may have come in since.
+    """
+    if date > datetime.now():
+        return 'unavailable'
+
+    job = get_latest_job(conn, date)
+    if job is None or (job['status'] == 'done' and get_job_created(job) < analysis_checkpoint(date)):
+        enqueue_analysis(conn, date)
+        return 'pending'
+    return 'unavailable' if job['status'] == 'done' else job['status']
+
+def claim_job(conn: sqlite3.Connection, dates: Optional[Tuple[str, str]] = None) -> Optional[sqlite3.Row]:
+    """
+    Take the next runnable job (or one abandoned by a worker) and mark it
+    as running, only of the (first, last) `dates` when given.
+    """
+    first, last = dates or ('', '9999-12-31')
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        job = conn.execute("""
+            SELECT * FROM analysis_jobs
+            WHERE ((status = 'pending' AND run_after <= CURRENT_TIMESTAMP)
+                   OR (status = 'running' AND started_at <= datetime('now', ?)))
+              AND date BETWEEN ? AND ?
+            ORDER BY run_after, id
+            LIMIT 1
+        """, (f'-{JOB_TIMEOUT} seconds', first, last)).fetchone()
+        if job:
+            conn.execute("""
+                UPDATE analysis_jobs
+                SET status = 'running', attempts = attempts + 1, started_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            """, (job['id'],))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return job
+
+def finish_job(conn: sqlite3.Connection, job_id: int):
+    """Mark a job as done."""
+    with conn:
+        conn.execute("""
+            UPDATE analysis_jobs SET status = 'done', error = NULL, finished_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        """, (job_id,))
+
+def fail_job(conn: sqlite3.Connection, job: sqlite3.Row, error: str) -> bool:
+    """
+    Schedule a retry of a job, or mark it as failed after MAX_ATTEMPTS.
+    Returns whether the job failed for good.
+    """
+    attempts = job['attempts'] + 1
+    with conn:
+        if attempts < MAX_ATTEMPTS:
+            conn.execute("""
+                UPDATE analysis_jobs SET status = 'pending', error = ?, run_after = datetime('now', ?)
+                WHERE id = ?
+            """, (error, f'+{RETRY_DELAY * attempts} seconds', job['id']))
+            return False
+        conn.execute("""
+            UPDATE analysis_jobs SET status = 'failed', error = ?, finished_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        """, (error, job['id']))
+    return True
+
+def release_job(conn: sqlite3.Connection, job_id: int):
+    """Put a running job back in the queue without counting the attempt, when its worker is stopped."""
+    with conn:
+        conn.execute("""
+            UPDATE analysis_jobs SET status = 'pending', attempts = MAX(attempts - 1, 0), started_at = NULL
+            WHERE id = ? AND status = 'running'
+        """, (job_id,))
+
+def count_queued(conn: sqlite3.Connection, dates: Optional[Tuple[str, str]] = None) -> int:
+    """Count the pending and running jobs, of the (first, last) `dates` when given."""
+    first, last = dates or ('', '9999-12-31')
+    return conn.execute("""
+        SELECT COUNT(*) FROM analysis_jobs
+        WHERE status IN ('pending', 'running') AND date BETWEEN ? AND ?
+    """, (first, last)).fetchone()[0]
+
+def run_job(conn: sqlite3.Connection, job: sqlite3.Row) -> bool:
+    """
+    Generate and store the analysis of a job. Today, and days analyzed
+    while they were running, are brought up to date slice by slice (see
+    ai.update_intraday_analysis); `force` regenerates the whole day.
+    Returns whether an analysis was stored.
+    """
+    from .ai import analyze_daily_incidents, update_intraday_analysis
+
+    date = datetime.strptime(job['date'], '%Y-%m-%d')
+    coverage = get_analysis_coverage(conn, date)
+    if not job['force'] and coverage is not None and coverage >= analysis_checkpoint(date):
+        return False
+
+    count = conn.execute(
+        "SELECT COUNT(*) FROM incidents WHERE timestamp >= ? AND timestamp < date(?, '+1 day')",
+        (date, job['date'])
+    ).fetchone()[0]
+    if not count:
+        logger.info(f"No incidents on {job['date']}, nothing to analyze")
+        return False
+
+    if not job['force'] and (date.date() == datetime.now().date() or get_slices(conn, date)):
+        return update_intraday_analysis(date)
+
+    store_analysis(analyze_daily_incidents(None, date))
+    return True
+
+def process_job(conn: sqlite3.Connection, job: sqlite3.Row) -> str:
+    """
+    Run a claimed job and record its result. Returns 'stored', 'skipped'
+    (nothing to store), 'retry' or 'failed'.
+    """
+    logger.info(f"Analyzing {job['date']} (job {job['id']}, attempt {job['attempts'] + 1})")
+    started = time.monotonic()
+    try:
+        stored = run_job(conn, job)
+    except Exception as e:
+        logger.error(f"Analysis of {job['date']} failed: {str(e)}")
+        return 'failed' if fail_job(conn, job, str(e)) else 'retry'
+
+    finish_job(conn, job['id'])
+    logger.info(f"Finished {job['date']} in {time.monotonic() - started:.1f}s"
+                + ("" if stored else " (nothing stored)"))
+    return 'stored' if stored else 'skipped'
+
+def run_worker(poll_interval: float = 5.0, once: bool = False,
+               stop_event: Optional[threading.Event] = None) -> int:
+    """
+    Run queued analysis jobs until stopped, or until the queue is empty
+    with `once`. Returns the number of jobs processed.
+    """
+    conn = get_db_connection()
+    processed = 0
+
+    while not (stop_event and stop_event.is_set()):
+        job = claim_job(conn)
+        if job is None:
+            if once:
+                break
+            if stop_event:
+                stop_event.wait(poll_interval)
+            else:
+                time.sleep(poll_interval)
+            continue
+
+        process_job(conn, job)
+        processed += 1
+
+    return processed
+
+def queue_range(conn: sqlite3.Connection, first: datetime, last: datetime, force: bool = False) -> Dict[str, int]:
+    """
+    Queue the analysis of every date from `first` to `last`, skipping
+    dates whose stored analysis is complete unless `force` is given.
+
+    Jobs already queued for the range (by an interrupted run, a dashboard
+    view or enqueue-analysis) are resumed, and `force` applies to them too.
+    Running the range again without `force` resumes an interrupted forced
+    run without redoing the dates it finished. Returns the number of dates
+    'queued', 'resumed' and 'skipped'.
+    """
+    dates = (first.strftime('%Y-%m-%d'), last.strftime('%Y-%m-%d'))
+    counts = {'queued': 0, 'resumed': count_queued(conn, dates), 'skipped': 0}
+
+    date = first
+    while date <= last and date <= datetime.now():
+        coverage = get_analysis_coverage(conn, date)
+        if not force and coverage is not None and coverage >= analysis_checkpoint(date):
+            counts['skipped'] += 1
+        elif enqueue_analysis(conn, date, force):
+            counts['queued'] += 1
+        date += timedelta(days=1)
+    return counts
+
+def run_range(first: datetime, last: datetime, concurrency: int = 4, poll_interval: float = 1.0) -> Dict[str, int]:
+    """
+    Run the queued jobs of the dates from `first` to `last` with
+    `concurrency` workers, until none is pending (retries included).
+
+    Jobs still running when interrupted go back to the queue, so running
+    queue_range and run_range again resumes the range. Returns the number
+    of jobs per result of process_job.
+    """
+    dates = (first.strftime('%Y-%m-%d'), last.strftime('%Y-%m-%d'))
+    results = {'stored': 0, 'skipped': 0, 'retry': 0, 'failed': 0}
+    active = set()
+    lock = threading.Lock()
+    stop_event = threading.Event()
+
+    def work():
+        conn = get_db_connection()
+        while not stop_event.is_set():
+            job = claim_job(conn, dates)
+            if job is None:
+                if not count_queued(conn, dates):
+                    break
+                # Retries waiting for their delay, or jobs of other workers
+                stop_event.wait(poll_interval)
+                continue
+
+            with lock:
+                active.add(job['id'])
+            result = process_job(conn, job)
+            with lock:
+                active.discard(job['id'])
+                results[result] += 1
+
+    threads = [threading.Thread(target=work, daemon=True) for _ in range(max(1, concurrency))]
+    for thread in threads:
+        thread.start()
+    try:
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(0.5)
+    except KeyboardInterrupt:
+        stop_event.set()
+        conn = get_db_connection()
+        with lock:
+            for job_id in active:
+                release_job(conn, job_id)
+        raise
+    return results
@@ -0,0 +1,144 @@
+from collections import deque
+import logging
+import os
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .db import connect, get_db_connection, get_latest_incident_id
+from .search import incident_to_dict
+
+# How often the feed checks the ingest sequence, in seconds
+POLL_INTERVAL = float(os.getenv('STREAM_POLL_INTERVAL', '1.0'))
+
+# Newest incidents kept in memory for the subscribers
+BUFFER_SIZE = 2000
+
+INCIDENT_COLUMNS = "id, timestamp, service_type, region, message, details"
+
+logger = logging.getLogger(__name__)
+
+class IncidentFeed:
+    """
+    Follows the ingest sequence (the last incident id) for all the live
+    streams of a worker process.
+
+    A single background thread polls the database and keeps the newest
+    incidents in memory, so an idle subscriber costs a wait on a condition
+    variable instead of a database query. Under gevent the thread and the
+    condition are cooperative.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, poll_interval: float = POLL_INTERVAL,
+                 buffer_size: int = BUFFER_SIZE):
+        self.db_path = db_path
+        self.poll_interval = poll_interval
+        self.buffer = deque(maxlen=buffer_size)
+        self.condition = threading.Condition()
+        self.latest_id = None
+        # The buffer holds every incident after this id
+        self.buffer_after = None
+        self.subscribers = 0
+        self.thread = None
+
+    def start(self):
+        """Start the polling thread if it is not running yet."""
+        with self.condition:
+            if self.thread is not None:
+                return
+            self.latest_id = self.buffer_after = get_latest_incident_id(get_db_connection(self.db_path))
+            self.thread = threading.Thread(target=self.run, name='incident-feed', daemon=True)
+            self.thread.start()
+
+    def run(self):
+        """Poll for new incidents and wake up the subscribers when there are some."""
+        conn = connect(self.db_path)
+        while True:
+            try:
+                rows = conn.execute(f"""
+                    SELECT {INCIDENT_COLUMNS} FROM incidents
+                    WHERE id > ? ORDER BY id LIMIT ?
+                """, (self.latest_id, self.buffer.maxlen)).fetchall()
+            except Exception as e:
+                logger.error(f"Error polling for new incidents: {str(e)}")
+                rows = []
+
+            if rows:
+                with self.condition:
+                    for row in rows:
+                        if len(self.buffer) == self.buffer.maxlen:
+                            self.buffer_after = self.buffer[0]['id']
+                        self.buffer.append(incident_to_dict(row))
+                    self.latest_id = rows[-1]['id']
+                    self.condition.notify_all()
+
+            # Catch up without waiting after a large batch
+            if len(rows) < self.buffer.maxlen:
+                time.sleep(self.poll_interval)
+
+    def wait(self, after_id: int, timeout: float) -> int:
+        """Wait up to `timeout` seconds for incidents after `after_id`. Returns the latest id."""
+        self.start()
+        with self.condition:
+            self.condition.wait_for(lambda: self.latest_id > after_id, timeout)
+            return self.latest_id
+
+    def incidents_between(self, after_id: int, last_id: int) -> List[Dict]:
+        """
+        Get the incidents with ids in (after_id, last_id], oldest first, at
+        most a buffer's worth at a time.
+        """
+        with self.condition:
+            if after_id >= self.buffer_after:
+                return [incident for incident in self.buffer if after_id < incident['id'] <= last_id]
+
+        # The subscriber fell behind the buffer while it was streaming
+        rows = get_db_connection(self.db_path).execute(f"""
+            SELECT {INCIDENT_COLUMNS} FROM incidents
+            WHERE id > ? AND id <= ? ORDER BY id LIMIT ?
+        """, (after_id, last_id, self.buffer.maxlen)).fetchall()
+        return [incident_to_dict(row) for row in rows]
+
+    def follow(self, after_id: Optional[int], heartbeat: float) -> Iterator[Tuple[int, List[Dict]]]:
+        """
+        Yield the (latest id, incidents) of every batch ingested after
+        `after_id`, or after now when it is None, oldest incident first.
+        Yields an empty batch when nothing arrived for `heartbeat` seconds.
+
+        `after_id` comes from the client, so it is clamped to the buffer:
+        a subscriber catches up on at most BUFFER_SIZE incidents, older
+        ones are fetched with /api/incidents?since=.
+        """
+        self.start()
+        with self.condition:
+            self.subscribers += 1
+            if after_id is None:
+                after_id = self.latest_id
+            after_id = min(max(after_id, self.buffer_after), self.latest_id)
+        try:
+            while True:
+                latest_id = self.wait(after_id, heartbeat)
+                if latest_id > after_id:
+                    incidents = self.incidents_between(after_id, latest_id)
+                    if len(incidents) == self.buffer.maxlen:
+                        # Continue from the last incident of a truncated catch-up
+                        latest_id = incidents[-1]['id']
+                    after_id = latest_id
+                    yield latest_id, incidents
+                else:
+                    yield after_id, []
+        finally:
+            with self.condition:
+                self.subscribers -= 1
+
+_feeds = {}
+_feeds_lock = threading.Lock()
+
+def get_feed() -> IncidentFeed:
+    """Get the incident feed of the current process."""
+    with _feeds_lock:
+        # Never reuse a feed inherited from a parent process, its thread did not survive the fork
+        feed = _feeds.get(os.getpid())
+        if feed is None:
+            feed = _feeds[os.getpid()] = IncidentFeed()
+        return feed
@@ -0,0 +1,186 @@
+from datetime import datetime
+from functools import lru_cache
+from lxml import etree
+from lxml import html as lxml_html
+from typing import Optional, List, Dict
+
+# Compiled once, these are reused for every page
+_TABLES = etree.XPath('//table')
+_ROWS = etree.XPath('.//tr')
+_CELLS = etree.XPath('.//td')
+_TEXT = etree.XPath('string()')
+
+@lru_cache(maxsize=4096)
+def parse_datetime(date_str: str) -> Optional[datetime]:
+    """
+    Parse the P2000 datetime string into a datetime object.
+
+    Cached, since each timestamp is parsed by the parser, the stop checks
+    and the ingest path.
+    """
+    try:
+        if not date_str or not date_str.strip():
+            return None
+        return datetime.strptime(date_str.strip(), "%d-%m-%Y %H:%M:%S")
+    except ValueError:
+        return None
+
+def _cell_text(cell) -> str:
+    return _TEXT(cell).strip()
+
+def _has_class(cell) -> bool:
+    return bool(cell.get('class', '').split())
+
+def _find_main_table(tables):
+    """Find the table that has rows with the expected incident structure."""
+    for table in tables:
+        for row in _ROWS(table):
+            cells = _CELLS(row)
+            # Check if this row has the expected classes (DT, Am/Br/Po, Regio, Md)
+            if len(cells) == 4 and any(_has_class(cell) for cell in cells):
+                return table
+    return None
+
+def parse_incidents(page_html: str) -> Optional[List[Dict]]:
+    """
+    Parse the incidents on a P2000 page.
+
+    Walks the rows of the data table once: a 4-cell row with a valid
+    timestamp starts an incident and the detail rows directly following it
+    (4 cells with the first 3 empty, or 3 cells with the first 2 empty)
+    are collected as its details.
+
+    Returns None if the page has no data table.
+    """
+    if not page_html or not page_html.strip():
+        return None
+
+    main_table = _find_main_table(_TABLES(lxml_html.document_fromstring(page_html)))
+    if main_table is None:
+        return None
+
+    incidents = []
+    current_incident = None
+    in_details = False
+
+    for row in _ROWS(main_table):
+        cells = _CELLS(row)
+
+        if in_details:
+            if len(cells) == 4 and not any(_cell_text(c) for c in cells[:3]):
+                detail = _cell_text(cells[3])
+                if detail:
+                    current_incident['details'].append(detail)
+                continue
+            if len(cells) == 3 and not any(_cell_text(c) for c in cells[:2]):
+                detail = _cell_text(cells[2])
+                if detail:
+                    current_incident['details'].append(detail)
+                continue
+            in_details = False
+
+        # Main incident row (has 4 cells) with a valid timestamp
+        if len(cells) == 4:
+            timestamp = _cell_text(cells[0])
+            if timestamp and parse_datetime(timestamp):
+                current_incident = {
+                    'timestamp': timestamp,
+                    'service_type': _cell_text(cells[1]),
+                    'region': _cell_text(cells[2]),
+                    'message': _cell_text(cells[3]),
+                    'details': []
+                }
+                incidents.append(current_incident)
+                in_details = True
+
+    return incidents
+
+def parse_incidents_soup(page_html: str) -> Optional[List[Dict]]:
+    """
+    Reference BeautifulSoup implementation of parse_incidents.
+
+    Kept to check the lxml parser against and to benchmark it, the scraper
+    does not use it.
+    """
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(page_html, 'lxml')
+
+    # Find all tables
+    tables = soup.find_all('table')
+
+    # Find the main data table
+    main_table = None
+    for table in tables:
+        # Look for the table that has rows with the expected incident structure
+        rows = table.find_all('tr')
+        for row in rows:
+            cells = row.find_all('td')
+            if len(cells) == 4:
+                # Check if this row has the expected classes (DT, Am/Br/Po, Regio, Md)
+                if any(cell.get('class', []) for cell in cells):
+                    main_table = table
+                    break
+        if main_table:
+            break
+
+    if not main_table:
+        return None
+
+    incidents = []
+    current_incident = None
+
+    # Group rows that belong to the same incident
+    rows = main_table.find_all('tr')
+    i = 0
+    while i < len(rows):
+        row = rows[i]
+        cells = row.find_all('td')
+
+        # Main incident row (has 4 cells)
+        if len(cells) == 4:
+            timestamp = cells[0].text.strip()
+
+            # Only process rows with valid timestamps
+            if timestamp and parse_datetime(timestamp):
+                if current_incident:
+                    incidents.append(current_incident)
+
+                current_incident = {
+                    'timestamp': timestamp,
+                    'service_type': cells[1].text.strip(),
+                    'region': cells[2].text.strip(),
+                    'message': cells[3].text.strip(),
+                    'details': []
+                }
+
+                # Look ahead for detail rows
+                j = i + 1
+                while j < len(rows):
+                    detail_row = rows[j]
+                    detail_cells = detail_row.find_all('td')
+
+                    # Detail row has 4 cells with first 3 empty
+                    if len(detail_cells) == 4 and all(not c.text.strip() for c in detail_cells[:3]):
+                        detail = detail_cells[3].text.strip()
+                        if detail:
+                            current_incident['details'].append(detail)
+                        j += 1
+                    # Detail row has 3 cells with first 2 empty
+                    elif len(detail_cells) == 3 and all(not c.text.strip() for c in detail_cells[:2]):
+                        detail = detail_cells[2].text.strip()
+                        if detail:
+                            current_incident['details'].append(detail)
+                        j += 1
+                    else:
+                        break
+
+                i = j - 1  # Update main loop counter to skip processed detail rows
+
+        i += 1
+
+    # Add the last incident if exists
+    if current_incident:
+        incidents.append(current_incident)
+
+    return incidents
@@ -0,0 +1,123 @@
+from datetime import datetime
+import logging
+import os
+import sqlite3
+import threading
+from typing import Dict, List, Sequence, Tuple
+
+# Token budget of a single cluster prompt, and the share message patterns may take of it
+PROMPT_TOKEN_BUDGET = int(os.getenv('AI_PROMPT_TOKENS', '600'))
+PATTERN_SHARE = 0.7
+
+# Sample candidates per hour of the day and service type, and regions listed by name in a prompt
+SAMPLE_ROUNDS = 8
+TOP_REGIONS = 10
+
+# Hashes ids into a stable pseudo-random order, so a day always gets the same sample
+SAMPLE_ORDER = "(id * 2654435761) % 4294967296"
+
+# Candidates in round-robin order: every round takes one incident of each hour, from a
+# (region, message type) stratum of that hour not sampled yet, before any hour gets two.
+# Within a round the hours are visited with a stride of 7, so any prefix spreads over the day.
+SAMPLES_QUERY = f"""
+    WITH day AS (
+        SELECT
+            id, timestamp, service_type, region, message,
+            strftime('%H', timestamp) AS hour,
+            substr(message, 1, instr(message || ' ', ' ') - 1) AS message_type
+        FROM incidents
+        WHERE timestamp >= ? AND timestamp < ?
+    ),
+    strata AS (
+        SELECT *, ROW_NUMBER() OVER (
+            PARTITION BY service_type, hour, region, message_type ORDER BY {SAMPLE_ORDER}
+        ) AS stratum_rank
+        FROM day
+    ),
+    rounds AS (
+        SELECT *, ROW_NUMBER() OVER (
+            PARTITION BY service_type, hour ORDER BY stratum_rank, {SAMPLE_ORDER}
+        ) AS round
+        FROM strata
+    )
+    SELECT service_type, timestamp, hour, region, message_type, message
+    FROM rounds
+    WHERE round <= ?
+    ORDER BY service_type, round, (CAST(hour AS INTEGER) * 7) % 24
+"""
+
+logger = logging.getLogger(__name__)
+
+_encoding = None
+_encoding_lock = threading.Lock()
+
+def get_encoding():
+    """Get the tiktoken encoding of the model, None when tiktoken or its data is not available."""
+    global _encoding
+    with _encoding_lock:
+        if _encoding is None:
+            try:
+                import tiktoken
+                _encoding = tiktoken.get_encoding('o200k_base')
+            except Exception as e:
+                # Logged once, every later count uses the estimate
+                logger.warning(f"Estimating prompt tokens at 4 characters per token, "
+                               f"the tiktoken encoding is not available ({str(e)})")
+                _encoding = False
+        return _encoding or None
+
+def count_tokens(text: str) -> int:
+    """Count the tokens of a text, or estimate them at 4 characters per token without tiktoken."""
+    encoding = get_encoding()
+    if encoding:
+        return len(encoding.encode(text))
+    return (len(text) + 3) // 4
+
+def get_stratified_samples(conn: sqlite3.Connection, start_date: datetime, end_date: datetime) -> Dict[str, List[sqlite3.Row]]:
+    """Get the sample candidates of every service type, in the order they should be used."""
+    samples = {}
+    for row in conn.execute(SAMPLES_QUERY, (start_date, end_date, SAMPLE_ROUNDS)):
+        samples.setdefault(row['service_type'], []).append(row)
+    return samples
+
+def format_incident(row: sqlite3.Row) -> str:
+    """Format a sample incident as a single line, without the capcodes of its details."""
+    return f"{row['timestamp'][11:16]} | {row['region']} | {row['message']}"
+
+def format_regions(regions: Sequence[Tuple[str, int]], limit: int = TOP_REGIONS) -> str:
+    """Format (region, count) pairs, busiest first, naming at most `limit` regions."""
+    listed = ", ".join(f"{region} ({count})" for region, count in regions[:limit])
+    if len(regions) > limit:
+        listed += f" and {len(regions) - limit} more regions"
+    return listed
+
+def format_pattern(pattern: Dict, hours: bool = True) -> str:
+    """Format a message pattern (see clustering.cluster_messages) as a single line."""
+    regions = ', '.join(f"{region} ({count})" for region, count in pattern['regions'][:2])
+    if not hours:
+        return f"{pattern['count']} | {regions} | {pattern['template']}"
+    peak_hours = ', '.join(f"{hour:02d}h" for hour in pattern['peak_hours'])
+    return f"{pattern['count']} | {peak_hours} | {regions} | {pattern['template']}"
+
+def pack_lines(template: str, name: str, lines: Sequence[str], budget: int = PROMPT_TOKEN_BUDGET) -> Tuple[str, int, int]:
+    """
+    Fill the {name} and {name_count} fields of a prompt template with as
+    many lines as fit the token budget, in order. Other fields are left
+    for a later call.
+
+    Returns the prompt, its token count and the number of lines included.
+    """
+    def fill(chosen: Sequence[str]) -> str:
+        return template.replace(f'{{{name}_count}}', str(len(chosen))).replace(f'{{{name}}}', "\n".join(chosen))
+
+    used = count_tokens(fill([]))
+    count = 0
+    for line in lines:
+        tokens = count_tokens(line) + 1
+        if used + tokens > budget:
+            break
+        used += tokens
+        count += 1
+
+    prompt = fill(lines[:count])
+    return prompt, count_tokens(prompt), count
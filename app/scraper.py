@@ -1,11 +1,22 @@
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from datetime import datetime, timedelta
 import sqlite3
 import logging
 import time
 from typing import Optional, List, Dict, Tuple
+from .parser import parse_incidents, parse_datetime
+from .ratelimit import TokenBucket
+from .db import get_db_connection, close_db_connection, get_latest_incident_id, init_db
+from .aggregation import update_rollups
+from .search import update_search_index
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import argparse
+import json
+import signal
+import threading
 import sys
 import os
 
@@ -15,239 +26,275 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
+class NotModified(Exception):
+    """Raised when page 1 has not changed since the previous run."""
+
 class P2000Scraper:
     BASE_URL = "https://p2000-online.net/p2000.py"
-    MAX_CONSECUTIVE_ERRORS = 3
     MAX_EMPTY_PAGES = 2
+    REQUEST_TIMEOUT = 30
+    RETRY_STATUSES = (500, 502, 503, 504)
     
-    def __init__(self, db_path: str = None, delay: float = 1.0):
+    def __init__(self, db_path: str = None, delay: float = 1.0, base_url: str = None,
+                 retries: int = 3, backoff: float = 1.0):
         # Get database path from environment variable or fallback to provided path or default
         self.db_path = db_path or os.getenv('DB_PATH', os.path.join('data', 'p2000.db'))
+        self.base_url = base_url or os.getenv('P2000_BASE_URL', self.BASE_URL)
         self.delay = delay
-        self.consecutive_errors = 0
+        self.retries = retries
+        self.backoff = backoff
         self.empty_pages = 0
+        self.page_validators = None
+        self.rate_limiter = None
+        self.stop_event = threading.Event()
+        self.session = self.create_session(retries, backoff)
         self.setup_database()
     
+    def create_session(self, retries: int, backoff: float, pool_size: int = 4) -> requests.Session:
+        """
+        Create a pooled keep-alive session that retries server errors
+        with exponential backoff and accepts compressed responses.
+        """
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff,
+            status_forcelist=self.RETRY_STATUSES,
+            allowed_methods=["GET"],
+            respect_retry_after_header=True
+        )
+        adapter = HTTPAdapter(max_retries=retry, pool_connections=1, pool_maxsize=pool_size)
+        self.pool_size = pool_size
+        
+        session = requests.Session()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers.update({"Accept-Encoding": "gzip, deflate"})
+        return session
+    
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """Database connection, kept open for the lifetime of the scraper."""
+        return get_db_connection(self.db_path)
+    
+    def close(self):
+        """Close the HTTP session and the database connection."""
+        self.session.close()
+        close_db_connection(self.db_path)
+    
     def setup_database(self):
         """Create the database tables if they don't exist."""
-        with sqlite3.connect(self.db_path) as conn:
+        init_db(self.db_path)
+    
+    def get_state(self, name: str) -> Optional[Dict]:
+        """Get a persisted scraper state value."""
+        with self.connection as conn:
+            row = conn.execute(
+                "SELECT value FROM scraper_state WHERE name = ?", (name,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+    
+    def set_state(self, name: str, value: Dict):
+        """Persist a scraper state value."""
+        with self.connection as conn:
             conn.execute("""
-                CREATE TABLE IF NOT EXISTS incidents (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    timestamp DATETIME NOT NULL,
-                    service_type TEXT NOT NULL,
-                    region TEXT NOT NULL,
-                    message TEXT NOT NULL,
-                    details TEXT,
-                    raw_timestamp TEXT NOT NULL,
-                    UNIQUE(timestamp, service_type, region, message)
-                )
-            """)
+                INSERT OR REPLACE INTO scraper_state (name, value, updated_at)
+                VALUES (?, ?, CURRENT_TIMESTAMP)
+            """, (name, json.dumps(value)))
+            conn.commit()
+    
+    def clear_state(self, name: str):
+        """Remove a persisted scraper state value."""
+        with self.connection as conn:
+            conn.execute("DELETE FROM scraper_state WHERE name = ?", (name,))
             conn.commit()
     
+    @staticmethod
+    def incident_key(incident: Dict) -> List[str]:
+        """Get the key identifying an incident within its timestamp."""
+        return [incident['service_type'], incident['region'], incident['message']]
+    
+    def get_watermark(self) -> Optional[Dict]:
+        """Get the newest stored incident as {'timestamp', 'key'}, if any."""
+        return self.get_state('watermark')
+    
+    def is_past_watermark(self, incident: Dict, watermark: Dict) -> bool:
+        """Check whether an incident is at or before the watermark."""
+        incident_date = self.parse_datetime(incident['timestamp'])
+        watermark_date = datetime.fromisoformat(watermark['timestamp'])
+        
+        if incident_date < watermark_date:
+            return True
+        return incident_date == watermark_date and self.incident_key(incident) == watermark['key']
+    
     def parse_datetime(self, date_str: str) -> Optional[datetime]:
         """Parse the P2000 datetime string into a datetime object."""
-        try:
-            if not date_str or not date_str.strip():
-                return None
-            return datetime.strptime(date_str.strip(), "%d-%m-%Y %H:%M:%S")
-        except ValueError:
-            return None
+        return parse_datetime(date_str)
     
-    def scrape_page(self, page: int) -> List[Dict]:
-        """Scrape a single page of P2000 data."""
-        # Add delay before making the request
-        time.sleep(self.delay)
+    def fetch_page(self, page: int, conditional: bool = False) -> str:
+        """
+        Fetch the HTML of a single page of P2000 data.
+        
+        With conditional set, page 1 is requested with the validators of the
+        previous completed run and NotModified is raised on a 304.
+        Raises requests.RequestException once the retries are exhausted.
+        """
+        # Add delay before making the request, or wait for the shared
+        # rate limit when pages are fetched concurrently
+        if self.rate_limiter:
+            self.rate_limiter.acquire()
+        else:
+            time.sleep(self.delay)
         
         params = {
             "pagina": page,
             "aantal": 30  # Number of items per page
         }
         
-        try:
-            response = requests.get(self.BASE_URL, params=params)
-            
-            # Check for server error
-            if response.status_code == 500:
-                self.consecutive_errors += 1
-                logging.warning(f"Server error (500) on page {page}. Consecutive errors: {self.consecutive_errors}")
-                
-                if self.consecutive_errors >= self.MAX_CONSECUTIVE_ERRORS:
-                    logging.error(f"Reached maximum consecutive errors ({self.MAX_CONSECUTIVE_ERRORS}). Stopping scraper.")
-                    return []
-                
-                return []  # Skip this page and continue with the next
-            
-            # Reset error counter on successful request
-            self.consecutive_errors = 0
-            
-            response.raise_for_status()
-            soup = BeautifulSoup(response.text, 'lxml')
-            
-            # Find all tables
-            tables = soup.find_all('table')
-            
-            # Find the main data table
-            main_table = None
-            for table in tables:
-                # Look for the table that has rows with the expected incident structure
-                rows = table.find_all('tr')
-                for row in rows:
-                    cells = row.find_all('td')
-                    if len(cells) == 4:
-                        # Check if this row has the expected classes (DT, Am/Br/Po, Regio, Md)
-                        if any(cell.get('class', []) for cell in cells):
-                            main_table = table
-                            break
-                if main_table:
-                    break
-            
-            if not main_table:
-                logging.warning(f"Could not find main data table on page {page}")
-                return []
-            
-            incidents = []
-            current_incident = None
-            
-            # Group rows that belong to the same incident
-            rows = main_table.find_all('tr')
-            i = 0
-            while i < len(rows):
-                row = rows[i]
-                cells = row.find_all('td')
-                
-                # Main incident row (has 4 cells)
-                if len(cells) == 4:
-                    timestamp = cells[0].text.strip()
-                    
-                    # Only process rows with valid timestamps
-                    if timestamp and self.parse_datetime(timestamp):
-                        if current_incident:
-                            incidents.append(current_incident)
-                        
-                        current_incident = {
-                            'timestamp': timestamp,
-                            'service_type': cells[1].text.strip(),
-                            'region': cells[2].text.strip(),
-                            'message': cells[3].text.strip(),
-                            'details': []
-                        }
-                        
-                        # Look ahead for detail rows
-                        j = i + 1
-                        while j < len(rows):
-                            detail_row = rows[j]
-                            detail_cells = detail_row.find_all('td')
-                            
-                            # Detail row has 4 cells with first 3 empty
-                            if len(detail_cells) == 4 and all(not c.text.strip() for c in detail_cells[:3]):
-                                detail = detail_cells[3].text.strip()
-                                if detail:
-                                    current_incident['details'].append(detail)
-                                j += 1
-                            # Detail row has 3 cells with first 2 empty
-                            elif len(detail_cells) == 3 and all(not c.text.strip() for c in detail_cells[:2]):
-                                detail = detail_cells[2].text.strip()
-                                if detail:
-                                    current_incident['details'].append(detail)
-                                j += 1
-                            else:
-                                break
-                        
-                        i = j - 1  # Update main loop counter to skip processed detail rows
-                
-                i += 1
-            
-            # Add the last incident if exists
-            if current_incident:
-                incidents.append(current_incident)
-            
-            # Validate number of incidents
-            if len(incidents) < 30 and page == 1:  # First page should always have 30 incidents
-                logging.warning(f"Found only {len(incidents)} incidents on page {page} (expected 30)")
-            
-            return incidents
-            
-        except requests.RequestException as e:
-            if "500" in str(e):
-                self.consecutive_errors += 1
-                logging.warning(f"Server error (500) on page {page}. Consecutive errors: {self.consecutive_errors}")
-                
-                if self.consecutive_errors >= self.MAX_CONSECUTIVE_ERRORS:
-                    logging.error(f"Reached maximum consecutive errors ({self.MAX_CONSECUTIVE_ERRORS}). Stopping scraper.")
-                    return []
-            else:
-                logging.error(f"Error fetching page {page}: {str(e)}")
+        headers = {}
+        if conditional:
+            validators = self.get_state('validators') or {}
+            if validators.get('etag'):
+                headers['If-None-Match'] = validators['etag']
+            if validators.get('last_modified'):
+                headers['If-Modified-Since'] = validators['last_modified']
+        
+        response = self.session.get(
+            self.base_url, params=params, headers=headers, timeout=self.REQUEST_TIMEOUT
+        )
+        
+        if response.status_code == 304:
+            raise NotModified()
+        
+        response.raise_for_status()
+        
+        if page == 1:
+            self.page_validators = {
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified')
+            }
+        
+        return response.text
+    
+    def scrape_page(self, page: int, conditional: bool = False) -> List[Dict]:
+        """Scrape a single page of P2000 data."""
+        incidents = parse_incidents(self.fetch_page(page, conditional))
+        
+        if incidents is None:
+            logging.warning(f"Could not find main data table on page {page}")
             return []
+        
+        # Validate number of incidents
+        if len(incidents) < 30 and page == 1:  # First page should always have 30 incidents
+            logging.warning(f"Found only {len(incidents)} incidents on page {page} (expected 30)")
+        
+        return incidents
     
     def store_incidents(self, incidents: List[Dict]) -> int:
-        """Store incidents in the database, avoiding duplicates."""
-        stored_count = 0
+        """
+        Store incidents in the database in a single transaction, avoiding
+        duplicates. Returns the number of incidents actually inserted.
+        """
+        rows = []
+        for incident in incidents:
+            try:
+                timestamp = self.parse_datetime(incident['timestamp'])
+                if timestamp:  # Only store incidents with valid timestamps
+                    rows.append((
+                        timestamp,
+                        incident['service_type'],
+                        incident['region'],
+                        incident['message'],
+                        '\n'.join(incident['details']),
+                        incident['timestamp']
+                    ))
+            except Exception as e:
+                logging.error(f"Error processing incident: {str(e)}")
         
-        with sqlite3.connect(self.db_path) as conn:
-            for incident in incidents:
-                try:
-                    timestamp = self.parse_datetime(incident['timestamp'])
-                    if timestamp:  # Only store incidents with valid timestamps
-                        conn.execute("""
-                            INSERT OR IGNORE INTO incidents 
-                            (timestamp, service_type, region, message, details, raw_timestamp)
-                            VALUES (?, ?, ?, ?, ?, ?)
-                        """, (
-                            timestamp,
-                            incident['service_type'],
-                            incident['region'],
-                            incident['message'],
-                            '\n'.join(incident['details']),
-                            incident['timestamp']
-                        ))
-                        
-                        if conn.total_changes > 0:
-                            stored_count += 1
-                            
-                except sqlite3.Error as e:
-                    logging.error(f"Database error: {str(e)}")
-                except Exception as e:
-                    logging.error(f"Error processing incident: {str(e)}")
-            
-            conn.commit()
+        if not rows:
+            return 0
         
+        try:
+            with self.connection as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                last_id = get_latest_incident_id(conn)
+                
+                # Ignored duplicates are not counted in rowcount
+                cursor = conn.executemany("""
+                    INSERT OR IGNORE INTO incidents 
+                    (timestamp, service_type, region, message, details, raw_timestamp)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """, rows)
+                stored_count = cursor.rowcount
+                
+                # Rows inserted in this transaction all have an id above last_id
+                if stored_count:
+                    update_rollups(conn, last_id)
+                    update_search_index(conn, last_id)
+        except sqlite3.Error as e:
+            logging.error(f"Database error: {str(e)}")
+            return 0
+        
+        logging.debug(f"Stored {stored_count} incidents, {len(rows) - stored_count} duplicates")
         return stored_count
     
-    def scrape_until_date(self, from_date: datetime) -> Tuple[int, int]:
+    def scrape_until_date(self, from_date: datetime, use_watermark: bool = True) -> Tuple[int, int]:
         """
-        Scrape P2000 data until reaching the specified date.
+        Scrape P2000 data until reaching the stored watermark, or the
+        specified date on a cold start (or when use_watermark is False).
         Returns tuple of (total_incidents, new_incidents).
         """
         page = 1
         total_incidents = 0
         new_incidents = 0
         reached_date = False
+        completed = False
+        newest = None
+        self.empty_pages = 0
+        self.page_validators = None
+        
+        watermark = self.get_watermark() if use_watermark else None
+        if watermark:
+            logging.info(f"Scraping until watermark {watermark['timestamp']}")
+        else:
+            logging.info(f"Scraping until {from_date.strftime('%Y-%m-%d %H:%M')}")
         
         while not reached_date:
-            logging.info(f"Scraping page {page}...")
-            incidents = self.scrape_page(page)
+            if self.stop_event.is_set():
+                logging.info("Stop requested, ending scrape early.")
+                break
             
-            # Check if we need to stop due to too many errors
-            if self.consecutive_errors >= self.MAX_CONSECUTIVE_ERRORS:
-                logging.warning("Stopping scraper due to too many consecutive server errors.")
+            logging.info(f"Scraping page {page}...")
+            try:
+                # Only page 1 is requested conditionally, and only when a
+                # watermark guarantees the previous run covered it.
+                incidents = self.scrape_page(page, conditional=page == 1 and watermark is not None)
+            except NotModified:
+                logging.info("Page 1 not modified since the last run, nothing to do.")
+                break
+            except requests.RequestException as e:
+                # Retries with backoff already happened in the session
+                logging.error(f"Error fetching page {page}, stopping scraper: {str(e)}")
                 break
             
             if not incidents:
-                if self.consecutive_errors > 0:
-                    # If it's a server error, try the next page
-                    page += 1
-                    continue
-                else:
-                    # If it's not a server error (empty page), stop scraping
-                    logging.info("No more incidents found.")
-                    break
+                logging.info("No more incidents found.")
+                completed = True
+                break
             
-            # Check if we've reached the target date
+            # Check if we've reached the watermark or the target date
             for incident in incidents:
                 incident_date = self.parse_datetime(incident['timestamp'])
-                if incident_date and incident_date < from_date:
-                    reached_date = True
+                if not incident_date:
+                    continue
+                
+                if newest is None or incident_date > newest[0]:
+                    newest = (incident_date, incident)
+                
+                if watermark:
+                    reached_date = self.is_past_watermark(incident, watermark)
+                else:
+                    reached_date = incident_date < from_date
+                if reached_date:
                     break
             
             stored = self.store_incidents(incidents)
@@ -261,6 +308,7 @@ class P2000Scraper:
                 self.empty_pages += 1
                 if self.empty_pages >= self.MAX_EMPTY_PAGES:
                     logging.info(f"Stopping after {self.MAX_EMPTY_PAGES} pages with no new incidents")
+                    completed = True
                     break
             else:
                 self.empty_pages = 0
@@ -268,8 +316,147 @@ class P2000Scraper:
             if not reached_date:
                 page += 1
         
+        # Only advance the watermark when everything newer than it has been
+        # scraped, otherwise the next run would skip the gap left behind.
+        if (completed or reached_date) and newest:
+            newest_date, newest_incident = newest
+            if not watermark or newest_date > datetime.fromisoformat(watermark['timestamp']):
+                self.set_state('watermark', {
+                    'timestamp': newest_date.isoformat(),
+                    'key': self.incident_key(newest_incident)
+                })
+            if self.page_validators:
+                self.set_state('validators', self.page_validators)
+        
         return total_incidents, new_incidents
 
+    def backfill(self, from_date: datetime, workers: int = 4, rate: Optional[float] = None,
+                 resume: bool = True) -> Tuple[int, int]:
+        """
+        Backfill P2000 data until reaching the specified date, fetching up to
+        `workers` pages concurrently under a shared limit of `rate` requests
+        per second (defaults to one request per delay).
+        
+        Pages are stored strictly in page order, so the stop-at-date logic is
+        the same as in scrape_until_date. After every stored page the
+        progress is checkpointed, and with resume set an interrupted backfill
+        for the same date continues after the last stored page.
+        Returns tuple of (total_incidents, new_incidents).
+        """
+        total_incidents = 0
+        new_incidents = 0
+        page = 1
+        
+        checkpoint = self.get_state('backfill')
+        if resume and checkpoint and checkpoint['from_date'] == from_date.isoformat():
+            page = checkpoint['page'] + 1
+            logging.info(f"Resuming backfill at page {page}")
+        
+        if rate is None:
+            rate = 1 / self.delay if self.delay > 0 else float(workers)
+        self.rate_limiter = TokenBucket(rate)
+        if workers > self.pool_size:
+            self.session.close()
+            self.session = self.create_session(self.retries, self.backoff, workers)
+        
+        logging.info(f"Backfilling until {from_date.strftime('%Y-%m-%d %H:%M')} "
+                     f"with {workers} workers at {rate:g} requests/sec")
+        
+        # Pages are fetched ahead in a sliding window and consumed in order
+        in_flight = deque()
+        next_page = page
+        
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                while True:
+                    while len(in_flight) < workers:
+                        in_flight.append((next_page, executor.submit(self.scrape_page, next_page)))
+                        next_page += 1
+                    
+                    if self.stop_event.is_set():
+                        logging.info("Stop requested, ending backfill early.")
+                        break
+                    
+                    page, future = in_flight.popleft()
+                    try:
+                        incidents = future.result()
+                    except requests.RequestException as e:
+                        logging.error(f"Error fetching page {page}, stopping backfill: {str(e)}")
+                        break
+                    
+                    if not incidents:
+                        logging.info("No more incidents found.")
+                        self.clear_state('backfill')
+                        break
+                    
+                    stored = self.store_incidents(incidents)
+                    total_incidents += len(incidents)
+                    new_incidents += stored
+                    logging.info(f"Page {page}: processed {len(incidents)} incidents, {stored} new")
+                    
+                    # Check if we've reached the target date
+                    if any(
+                        incident_date and incident_date < from_date
+                        for incident_date in (self.parse_datetime(i['timestamp']) for i in incidents)
+                    ):
+                        logging.info("Reached target date, backfill complete.")
+                        self.clear_state('backfill')
+                        break
+                    
+                    self.set_state('backfill', {'from_date': from_date.isoformat(), 'page': page})
+                
+                for _, future in in_flight:
+                    future.cancel()
+        finally:
+            self.rate_limiter = None
+        
+        return total_incidents, new_incidents
+
+def touch_liveness_file(path: str):
+    """Record the time of the last completed poll for health checks."""
+    with open(path, 'w') as f:
+        f.write(datetime.now().isoformat())
+
+def run_daemon(scraper: P2000Scraper, window: timedelta, interval: float,
+               liveness_file: Optional[str] = None, use_watermark: bool = True):
+    """
+    Poll P2000 every `interval` seconds in a single long-running process,
+    reusing the scraper's HTTP session and database connection. Every poll
+    scrapes the whole `window` without `use_watermark`.
+    Stops cleanly on SIGTERM or SIGINT.
+    """
+    def request_stop(signum, frame):
+        logging.info(f"Received signal {signum}, shutting down...")
+        scraper.stop_event.set()
+    
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+    
+    logging.info(f"Starting scraper daemon (interval: {interval}s, window: {window}"
+                 + ("" if use_watermark else ", ignoring the watermark") + ")")
+    next_run = time.monotonic()
+    
+    try:
+        while not scraper.stop_event.is_set():
+            try:
+                total, new = scraper.scrape_until_date(datetime.now() - window, use_watermark=use_watermark)
+                logging.info(f"Poll finished: {total} incidents processed, {new} new")
+                if liveness_file:
+                    touch_liveness_file(liveness_file)
+            except Exception as e:
+                logging.error(f"Poll failed: {str(e)}")
+            
+            # Schedule against the previous start so polls don't drift
+            next_run += interval
+            delay = next_run - time.monotonic()
+            if delay < 0:
+                next_run = time.monotonic()
+                delay = 0
+            scraper.stop_event.wait(delay)
+    finally:
+        scraper.close()
+        logging.info("Scraper daemon stopped.")
+
 def parse_date(date_str: str) -> datetime:
     """Parse date string in various formats."""
     formats = [
@@ -305,21 +492,30 @@ Examples:
   # Scrape data from the last 30 minutes
   python scraper.py --minutes 30
   
-  # Scrape data from a specific date
+  # Backfill data from a specific date (resumes an interrupted backfill)
   python scraper.py --from-date 2024-01-01
   
+  # Backfill with 8 concurrent workers at up to 4 requests per second
+  python scraper.py --from-date 2024-01-01 --workers 8 --rate 4
+  
   # Scrape data to a specific database file
   python scraper.py --days 7 --db-path custom.db
   
   # Scrape with custom delay between requests
   python scraper.py --days 1 --delay 2.5
   
+  # Rescrape the whole window, ignoring the newest stored incident
+  python scraper.py --hours 6 --ignore-watermark
+  
+  # Run as a daemon polling the last 30 minutes every 60 seconds
+  python scraper.py --daemon --minutes 30 --interval 60
+  
   # Scrape with debug logging
   python scraper.py --days 1 --debug
         """
     )
     
-    date_group = parser.add_mutually_exclusive_group(required=True)
+    date_group = parser.add_mutually_exclusive_group()
     date_group.add_argument(
         '--days',
         type=int,
@@ -355,6 +551,75 @@ Examples:
         help='Delay in seconds between requests (default: 1.0)'
     )
     
+    parser.add_argument(
+        '--retries',
+        type=int,
+        default=3,
+        help='Retries per page on connection errors and 5xx responses (default: 3)'
+    )
+    
+    parser.add_argument(
+        '--backoff',
+        type=float,
+        default=1.0,
+        help='Exponential backoff factor in seconds between retries (default: 1.0)'
+    )
+    
+    parser.add_argument(
+        '--base-url',
+        type=str,
+        default=None,
+        help=f'P2000 page URL (default: $P2000_BASE_URL or {P2000Scraper.BASE_URL})'
+    )
+    
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=4,
+        help='Pages fetched concurrently when backfilling with --from-date (default: 4)'
+    )
+    
+    parser.add_argument(
+        '--rate',
+        type=float,
+        default=None,
+        help='Maximum requests per second when backfilling (default: 1 / --delay)'
+    )
+    
+    parser.add_argument(
+        '--restart',
+        action='store_true',
+        help='Start a --from-date backfill at page 1 instead of resuming from its checkpoint'
+    )
+    
+    parser.add_argument(
+        '--ignore-watermark',
+        action='store_true',
+        help='Scrape the full time window instead of stopping at the newest stored incident'
+    )
+    
+    parser.add_argument(
+        '--daemon',
+        action='store_true',
+        help='Keep running and poll every --interval seconds '
+             '(the time window is only used until a watermark exists, unless --ignore-watermark)'
+    )
+    
+    parser.add_argument(
+        '--interval',
+        type=float,
+        default=60.0,
+        help='Seconds between polls in daemon mode (default: 60)'
+    )
+    
+    parser.add_argument(
+        '--liveness-file',
+        type=str,
+        default=None,
+        help='File touched after every successful poll in daemon mode '
+             '(default: scraper.alive next to the database)'
+    )
+    
     parser.add_argument(
         '--debug',
         action='store_true',
@@ -363,6 +628,13 @@ Examples:
     
     args = parser.parse_args()
     
+    if not (args.days or args.hours or args.minutes or args.from_date):
+        if not args.daemon:
+            parser.error("one of the arguments --days --hours --minutes --from-date is required")
+        args.minutes = 30
+    if args.daemon and args.from_date:
+        parser.error("--from-date cannot be used with --daemon")
+    
     # Set logging level
     if args.debug:
         logging.getLogger().setLevel(logging.DEBUG)
@@ -379,8 +651,28 @@ Examples:
             from_date = parse_date(args.from_date)
         
         # Initialize scraper and run
-        scraper = P2000Scraper(db_path=args.db_path, delay=args.delay)
-        total, new = scraper.scrape_until_date(from_date)
+        scraper = P2000Scraper(
+            db_path=args.db_path,
+            delay=args.delay,
+            base_url=args.base_url,
+            retries=args.retries,
+            backoff=args.backoff
+        )
+        
+        if args.daemon:
+            liveness_file = args.liveness_file or os.path.join(
+                os.path.dirname(args.db_path) or '.', 'scraper.alive'
+            )
+            run_daemon(scraper, datetime.now() - from_date, args.interval, liveness_file,
+                       use_watermark=not args.ignore_watermark)
+            return
+        
+        if args.from_date:
+            total, new = scraper.backfill(
+                from_date, workers=args.workers, rate=args.rate, resume=not args.restart
+            )
+        else:
+            total, new = scraper.scrape_until_date(from_date, use_watermark=not args.ignore_watermark)
         
         # Print summary
         print("\nScraping Summary:")
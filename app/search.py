@@ -0,0 +1,161 @@
+from datetime import datetime
+import base64
+import re
+import sqlite3
+from typing import Dict, List, Optional, Tuple
+
+# Quoted phrases or bare words
+_TERMS = re.compile(r'"([^"]*)"|(\S+)')
+
+def build_fts_query(search: str) -> Optional[str]:
+    """
+    Turn a search box string into an FTS5 MATCH expression.
+
+    Quoted text is matched as a phrase, bare words as prefixes (so "ambu"
+    finds "Ambulance"). All terms must match. Returns None if there is
+    nothing to search for.
+    """
+    terms = []
+    for phrase, word in _TERMS.findall(search or ''):
+        if phrase.strip():
+            terms.append('"{}"'.format(phrase.replace('"', '""')))
+        elif word:
+            word = word.replace('"', '').rstrip('*')
+            if word:
+                terms.append('"{}"*'.format(word))
+    return ' '.join(terms) or None
+
+def search_condition(fts_query: str, start_date: datetime, end_date: datetime,
+                     id_range: Optional[Tuple[int, int]] = None) -> Tuple[str, List]:
+    """
+    Get the (condition, params) restricting incidents in [start_date,
+    end_date) to the ones matching `fts_query`.
+
+    The match is limited to the id span of the date range (or to `id_range`
+    when given), so FTS5 only reads the part of each term's doclist that can
+    pass the other filters instead of every match since the first incident.
+    """
+    if id_range:
+        return """id IN (
+            SELECT rowid FROM incidents_fts
+            WHERE incidents_fts MATCH ? AND rowid > ? AND rowid <= ?
+        )""", [fts_query, *id_range]
+
+    condition = """id IN (
+            SELECT rowid FROM incidents_fts
+            WHERE incidents_fts MATCH ?
+            AND rowid BETWEEN (SELECT MIN(id) FROM incidents WHERE timestamp >= ? AND timestamp < ?)
+                          AND (SELECT MAX(id) FROM incidents WHERE timestamp >= ? AND timestamp < ?)
+        )"""
+    return condition, [fts_query, start_date, end_date, start_date, end_date]
+
+def incidents_conditions(start_date: datetime, end_date: datetime, service: str = '',
+                         region: str = '', search: str = '',
+                         id_range: Optional[Tuple[int, int]] = None) -> Tuple[List[str], List]:
+    """
+    Get the WHERE conditions and params selecting incidents in a date range
+    with optional filters.
+
+    With `id_range` (after_id, last_id), only the incidents ingested in that
+    span of ids are selected. The other filters are then kept off their
+    indexes (a unary + does that), so SQLite walks the few new ids instead of
+    the whole date range.
+    """
+    column = (lambda name: '+' + name) if id_range else (lambda name: name)
+    conditions = [f"{column('timestamp')} >= ? AND {column('timestamp')} < ?"]
+    params = [start_date, end_date]
+
+    if id_range:
+        conditions.insert(0, "id > ? AND id <= ?")
+        params[0:0] = id_range
+
+    if service:
+        conditions.append(f"{column('service_type')} = ?")
+        params.append(service)
+
+    if region:
+        conditions.append(f"{column('region')} = ?")
+        params.append(region)
+
+    fts_query = build_fts_query(search)
+    if fts_query:
+        condition, condition_params = search_condition(fts_query, start_date, end_date, id_range)
+        conditions.append(condition)
+        params.extend(condition_params)
+
+    return conditions, params
+
+def build_incidents_query(start_date: datetime, end_date: datetime, service: str = '',
+                          region: str = '', search: str = '', cursor: Optional[Tuple[str, int]] = None,
+                          limit: Optional[int] = None,
+                          id_range: Optional[Tuple[int, int]] = None) -> Tuple[str, List]:
+    """
+    Build the query listing incidents in a date range with optional filters,
+    newest first.
+
+    Pages are keyed on (timestamp, id): `cursor` is the (timestamp, id) of
+    the last incident of the previous page, so every page is an index range
+    scan no matter how deep it is. `id_range` limits the list to the
+    incidents ingested in (after_id, last_id], see incidents_conditions().
+    """
+    conditions, params = incidents_conditions(start_date, end_date, service, region, search, id_range)
+
+    if cursor and cursor[0] < str(end_date) and not id_range:
+        # Move the end of the range to the cursor, so the index scan starts there
+        conditions[0] = "timestamp >= ? AND timestamp <= ? AND (timestamp, id) < (?, ?)"
+        params[1:2] = [cursor[0], *cursor]
+
+    query = f"""
+        SELECT id, timestamp, service_type, region, message, details
+        FROM incidents
+        WHERE {' AND '.join(conditions)}
+        ORDER BY timestamp DESC, id DESC
+    """
+    if limit:
+        query += " LIMIT ?"
+        params.append(limit)
+    return query, params
+
+def build_incidents_count_query(start_date: datetime, end_date: datetime, service: str = '',
+                                region: str = '', search: str = '') -> Tuple[str, List]:
+    """Build the query counting the incidents build_incidents_query lists."""
+    conditions, params = incidents_conditions(start_date, end_date, service, region, search)
+    return f"SELECT COUNT(*) FROM incidents WHERE {' AND '.join(conditions)}", params
+
+def incident_to_dict(row: sqlite3.Row) -> Dict:
+    """Get the API representation of an incident row."""
+    return {
+        'id': row['id'],
+        'timestamp': row['timestamp'],
+        'service_type': row['service_type'],
+        'region': row['region'],
+        'message': row['message'],
+        'details': row['details']
+    }
+
+def encode_cursor(row: sqlite3.Row) -> str:
+    """Get the opaque cursor pointing after an incident row."""
+    return base64.urlsafe_b64encode(f"{row['timestamp']}|{row['id']}".encode()).decode()
+
+def decode_cursor(cursor: str) -> Optional[Tuple[str, int]]:
+    """Get the (timestamp, id) of a cursor, None if it is not valid."""
+    try:
+        timestamp, incident_id = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit('|', 1)
+        return timestamp, int(incident_id)
+    except (ValueError, UnicodeError):
+        return None
+
+def update_search_index(conn: sqlite3.Connection, after_id: int):
+    """
+    Add the incidents inserted after `after_id` to the full-text index.
+    Must run in the transaction that inserted them.
+    """
+    conn.execute("""
+        INSERT INTO incidents_fts (rowid, message, details)
+        SELECT id, message, details FROM incidents WHERE id > ?
+    """, (after_id,))
+
+def rebuild_search_index(conn: sqlite3.Connection):
+    """Rebuild the full-text index from the incidents table."""
+    with conn:
+        conn.execute("INSERT INTO incidents_fts (incidents_fts) VALUES ('rebuild')")
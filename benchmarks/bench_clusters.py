@@ -0,0 +1,80 @@
+"""
+Benchmark the cluster analyses of a day against the stub LLM.
+
+Starts benchmarks/stub_llm.py with --latency seconds per call, then times
+get_incident_clusters and the full daily analysis with one cluster call
+at a time and with --concurrency, and once more with --fail-rate to
+check that failing calls still produce an analysis:
+
+    python benchmarks/bench_clusters.py --latency 2 --concurrency 4
+
+Uses a synthetic week of incidents in --db unless it exists already.
+The LLM response cache is disabled, so every run makes its calls.
+"""
+from datetime import datetime, timedelta
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import stub_llm
+from bench_search import END, build_database
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark concurrent cluster analysis")
+    parser.add_argument('--db', type=str, default='clusters-bench.db', help='Database file (default: clusters-bench.db)')
+    parser.add_argument('--latency', type=float, default=1.0, help='Stub seconds per call (default: 1)')
+    parser.add_argument('--jitter', type=float, default=0.2, help='Stub latency jitter (default: 0.2)')
+    parser.add_argument('--concurrency', type=int, default=4, help='Concurrent cluster calls (default: 4)')
+    parser.add_argument('--fail-rate', type=float, default=0.3, help='Stub failure rate of the last run (default: 0.3)')
+    parser.add_argument('--port', type=int, default=8901, help='Stub port (default: 8901)')
+    args = parser.parse_args()
+
+    random.seed(42)
+    if not os.path.exists(args.db):
+        build_database(args.db, 30000, 7)
+
+    server = stub_llm.serve(args.port, args.latency, args.jitter)
+    os.environ.update(DB_PATH=args.db, OPENAI_API_KEY='stub',
+                      OPENAI_BASE_URL=f'http://127.0.0.1:{args.port}/v1')
+
+    from app import ai
+    from app.db import connect
+
+    ai.RETRY_BASE_DELAY = 0.1
+    # Every run has to call the stub, cached responses would skip the latency and failures
+    ai.cache_enabled = False
+    conn = connect(args.db)
+    start_date = END - timedelta(days=1)
+    end_date = END
+
+    print(f"Stub latency {args.latency}s +/- {args.jitter}s\n")
+    print(f"{'run':<24} {'clusters':>8} {'failed':>7} {'calls':>6} {'clusters s':>11} {'daily s':>8}")
+    runs = [('sequential', 1, 0.0), (f'concurrency {args.concurrency}', args.concurrency, 0.0),
+            (f'fail rate {args.fail_rate}', args.concurrency, args.fail_rate)]
+    for label, concurrency, fail_rate in runs:
+        ai.CLUSTER_CONCURRENCY = concurrency
+        stub_llm.Handler.fail_rate = fail_rate
+        stub_llm.Handler.requests = 0
+
+        started = time.perf_counter()
+        clusters = ai.get_incident_clusters(conn, start_date, end_date)
+        clusters_time = time.perf_counter() - started
+        failed = sum(cluster.severity_assessment.startswith('Unknown') for cluster in clusters)
+
+        started = time.perf_counter()
+        try:
+            ai.analyze_daily_incidents(None, datetime.combine(start_date.date(), datetime.min.time()))
+            daily = f"{time.perf_counter() - started:8.2f}"
+        except Exception:
+            daily = f"{'failed':>8}"
+        print(f"{label:<24} {len(clusters):>8} {failed:>7} {stub_llm.Handler.requests:>6} "
+              f"{clusters_time:>11.2f} {daily}")
+
+    server.shutdown()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""
+Compare the lxml page parser with the reference BeautifulSoup parser.
+
+Checks that both parsers produce identical output on every fixture in
+benchmarks/fixtures/ and reports pages/sec for each:
+
+    python benchmarks/bench_parser.py --repeat 50
+"""
+from typing import Callable, List
+import argparse
+import glob
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.parser import parse_incidents, parse_incidents_soup
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+def load_fixtures() -> List[str]:
+    paths = sorted(glob.glob(os.path.join(FIXTURES_DIR, '*.html')))
+    pages = []
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            pages.append(f.read())
+    return pages
+
+def pages_per_second(parse: Callable, pages: List[str], repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for page in pages:
+            parse(page)
+    return repeat * len(pages) / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the P2000 page parsers")
+    parser.add_argument('--repeat', type=int, default=20, help='Passes over the fixture corpus (default: 20)')
+    args = parser.parse_args()
+
+    pages = load_fixtures()
+    if not pages:
+        sys.exit(f"No fixtures found in {FIXTURES_DIR}")
+
+    for i, page in enumerate(pages):
+        if parse_incidents(page) != parse_incidents_soup(page):
+            sys.exit(f"Parser output differs on fixture {i + 1}")
+    incidents = sum(len(parse_incidents(page)) for page in pages)
+    print(f"Outputs identical on {len(pages)} fixtures ({incidents} incidents)")
+
+    soup_rate = pages_per_second(parse_incidents_soup, pages, args.repeat)
+    lxml_rate = pages_per_second(parse_incidents, pages, args.repeat)
+    print(f"BeautifulSoup: {soup_rate:8.1f} pages/sec")
+    print(f"lxml:          {lxml_rate:8.1f} pages/sec ({lxml_rate / soup_rate:.1f}x)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""
+Benchmark the local pre-clustering of a day's messages into patterns.
+
+Groups every day of --db (per service type, as the analysis does) and
+reports the messages, distinct templates and patterns of each day, the
+share of incidents the ten largest patterns cover and the time taken:
+
+    python benchmarks/bench_preclusters.py --db data/p2000.db --days 7
+
+Builds a synthetic database with --per-day incidents per day when --db
+does not exist.
+"""
+from collections import defaultdict
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_search import build_database
+from app.clustering import cluster_messages, message_template
+from app.db import connect
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark message pre-clustering")
+    parser.add_argument('--db', type=str, default='preclusters-bench.db', help='Database file (default: preclusters-bench.db)')
+    parser.add_argument('--days', type=int, default=7, help='Most recent days to cluster (default: 7)')
+    parser.add_argument('--per-day', type=int, default=5000, help='Incidents per day of a new database (default: 5000)')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per day, best is reported (default: 3)')
+    args = parser.parse_args()
+
+    random.seed(42)
+    if not os.path.exists(args.db):
+        build_database(args.db, args.per_day * args.days, args.days)
+
+    conn = connect(args.db)
+    last = conn.execute("SELECT date(MAX(timestamp)) FROM incidents").fetchone()[0]
+    if last is None:
+        sys.exit(f"No incidents in {args.db}")
+
+    print(f"{'day':<12} {'messages':>9} {'templates':>10} {'patterns':>9} {'top 10':>7} {'ms':>7}")
+    timings = []
+    for offset in range(args.days - 1, -1, -1):
+        day = conn.execute("SELECT date(?, ?)", (last, f'-{offset} days')).fetchone()[0]
+        rows = conn.execute("""
+            SELECT service_type, timestamp, region, message FROM incidents
+            WHERE timestamp >= ? AND timestamp < date(?, '+1 day')
+        """, (day, day)).fetchall()
+        if not rows:
+            continue
+        by_service = defaultdict(list)
+        for row in rows:
+            by_service[row['service_type']].append(row)
+
+        best = None
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            patterns = [cluster_messages(service_rows) for service_rows in by_service.values()]
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        timings.append(best)
+
+        top = sum(p['count'] for service_patterns in patterns for p in service_patterns[:10])
+        templates = len({message_template(row['message']) for row in rows})
+        print(f"{day:<12} {len(rows):>9} {templates:>10} {sum(map(len, patterns)):>9} "
+              f"{top / len(rows):>7.0%} {best * 1000:>7.1f}")
+
+    if timings:
+        print(f"\nmedian {statistics.median(timings) * 1000:.1f} ms, max {max(timings) * 1000:.1f} ms per day")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""
+Benchmark /api/incidents search: FTS5 index against the old LIKE scan.
+
+Builds a synthetic database (migrations included) with --rows incidents
+spread over --days days, then times both query shapes for a few search
+terms over a day, a week and a month:
+
+    python benchmarks/bench_search.py --rows 2000000 --db /tmp/search.db
+
+An existing --db is reused, so the slow build only happens once.
+"""
+from datetime import datetime, timedelta
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.db import connect, init_db
+from app.search import build_incidents_query, rebuild_search_index
+from app.aggregation import rebuild_rollups
+
+SERVICES = ['Ambulance', 'Politie', 'Brandweer']
+REGIONS = ['Amsterdam-Amstelland', 'Rotterdam-Rijnmond', 'Utrecht', 'Haaglanden', 'Twente',
+           'Gelderland-Zuid', 'Limburg-Noord', 'Fryslân', 'Groningen', 'Zeeland']
+TEMPLATES = [
+    'A1 Ambulance {n} Rit {r} {place}',
+    'A2 {street} {place} Rit {r}',
+    'P 1 BDH-01 Brand woning {street} {place} {n}',
+    'P 2 Ongeval wegvervoer letsel {street} {place}',
+    'B1 {street} {place} Rit {r}',
+    'PRIO 1 Gaslekkage binnen {street} {place}',
+]
+PLACES = ['Amsterdam', 'Zwolle', 'Den Haag', 'Delft', 'Leeuwarden', 'Maastricht', 'Enschede', 'Utrecht']
+STREETS = ['Kalverstraat', 'Stationsplein', 'Dorpsstraat', 'Coolsingel', 'Grote Markt', 'Hoofdweg']
+SEARCHES = ['Rit', 'gaslek', '"brand woning"', 'Kalverstraat Delft']
+END = datetime(2024, 12, 31)
+
+def build_database(path: str, rows: int, days: int):
+    init_db(path)
+    conn = connect(path)
+    start = END - timedelta(days=days)
+    step = days * 86400 / rows
+    batch = []
+
+    print(f"Inserting {rows} incidents...")
+    for i in range(rows):
+        timestamp = start + timedelta(seconds=i * step)
+        message = random.choice(TEMPLATES).format(
+            n=random.randint(10000, 99999), r=random.randint(1, 999999),
+            place=random.choice(PLACES), street=random.choice(STREETS)
+        )
+        batch.append((timestamp, random.choice(SERVICES), random.choice(REGIONS), message,
+                      f"{random.randint(1000000, 2999999)} MKA", timestamp.strftime('%d-%m-%Y %H:%M:%S')))
+        if len(batch) == 50000:
+            conn.executemany("""
+                INSERT OR IGNORE INTO incidents
+                (timestamp, service_type, region, message, details, raw_timestamp)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, batch)
+            conn.commit()
+            batch = []
+    if batch:
+        conn.executemany("""
+            INSERT OR IGNORE INTO incidents
+            (timestamp, service_type, region, message, details, raw_timestamp)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, batch)
+        conn.commit()
+
+    print("Building search index and rollups...")
+    rebuild_search_index(conn)
+    rebuild_rollups(conn)
+    conn.execute("ANALYZE")
+    conn.close()
+
+def like_query(start_date: datetime, end_date: datetime, search: str):
+    """The search query as it was before the full-text index."""
+    pattern = '%' + search.strip('"') + '%'
+    return """
+        SELECT timestamp, service_type, region, message, details
+        FROM incidents
+        WHERE timestamp >= ? AND timestamp < ? AND (message LIKE ? OR details LIKE ?)
+        ORDER BY timestamp DESC
+    """, [start_date, end_date, pattern, pattern]
+
+def time_query(conn, sql, params, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        count = len(conn.execute(sql, params).fetchall())
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return count, best
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark incident search")
+    parser.add_argument('--rows', type=int, default=2000000, help='Synthetic incidents (default: 2000000)')
+    parser.add_argument('--days', type=int, default=365, help='Days the incidents span (default: 365)')
+    parser.add_argument('--db', type=str, default='search-bench.db', help='Database file (default: search-bench.db)')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per query, best is reported (default: 3)')
+    args = parser.parse_args()
+
+    random.seed(42)
+    if not os.path.exists(args.db):
+        build_database(args.db, args.rows, args.days)
+
+    conn = connect(args.db)
+    total = conn.execute("SELECT COUNT(*) FROM incidents").fetchone()[0]
+    print(f"{total} incidents in {args.db}\n")
+    print(f"{'search':<22} {'range':<6} {'rows':>7} {'LIKE ms':>9} {'FTS ms':>9}")
+
+    for search in SEARCHES:
+        for label, days in (('day', 1), ('week', 7), ('month', 31)):
+            start_date = END - timedelta(days=days)
+            like_count, like_time = time_query(conn, *like_query(start_date, END, search), args.repeat)
+            fts_count, fts_time = time_query(conn, *build_incidents_query(start_date, END, search=search),
+                                             args.repeat)
+            print(f"{search:<22} {label:<6} {fts_count:>7} {like_time * 1000:>9.1f} {fts_time * 1000:>9.1f}"
+                  + ("" if like_count == fts_count else f"  (LIKE: {like_count} rows)"))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Benchmark the cold start of the web, scraper and CLI entry points.
+
+Imports every entry point in a fresh interpreter with -X importtime,
+--repeat times, and reports the median wall time of the process and of
+the import, followed by the slowest modules our code imports:
+
+    python benchmarks/bench_startup.py --repeat 5
+
+Imports run against a throwaway database, so migrations or other
+import-time database work would show up in the numbers.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ENTRY_POINTS = {
+    'web': 'wsgi',
+    'scraper': 'app.scraper',
+    'cli': 'app.cli',
+}
+
+def is_ours(module: str) -> bool:
+    return module == 'wsgi' or module == 'app' or module.startswith('app.')
+
+def import_once(module: str, env: dict):
+    """
+    Import `module` in a new interpreter. Returns the wall seconds, the
+    import seconds and the seconds of every module imported by our code.
+    """
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=ROOT, env=env, capture_output=True, text=True)
+    wall = time.perf_counter() - started
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+
+    total, dependencies, pending = 0.0, {}, {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        # Imports are listed after the modules they import, indented one level deeper
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        name, seconds = name.strip(), int(cumulative) / 1e6
+        children = pending.pop(depth + 1, [])
+        if is_ours(name):
+            for child, child_seconds in children:
+                if not is_ours(child):
+                    dependencies[child] = child_seconds
+        pending.setdefault(depth, []).append((name, seconds))
+        if name == module:
+            total = seconds
+    return wall, total, dependencies
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark entry point startup time")
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per entry point, the median is reported (default: 5)')
+    parser.add_argument('--top', type=int, default=6, help='Slowest dependencies to list (default: 6)')
+    parser.add_argument('--only', choices=sorted(ENTRY_POINTS), help='Benchmark a single entry point')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, DB_PATH=os.path.join(tmp, 'startup.db'), PYTHONPATH=ROOT)
+        # Older versions of app.ai need a key to build their client at import
+        env.setdefault('OPENAI_API_KEY', 'startup-bench')
+
+        for name, module in ENTRY_POINTS.items():
+            if args.only and args.only != name:
+                continue
+            runs = [import_once(module, env) for _ in range(args.repeat)]
+            wall = statistics.median(run[0] for run in runs)
+            total = statistics.median(run[1] for run in runs)
+            print(f"{name} ({module}): process {wall * 1000:.0f} ms, import {total * 1000:.0f} ms")
+
+            imports = runs[-1][2]
+            for imported in sorted(imports, key=imports.get, reverse=True)[:args.top]:
+                print(f"    {imports[imported] * 1000:8.1f} ms  {imported}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Local stand-in for p2000-online.net serving the saved HTML fixtures.
+
+Pages are served from benchmarks/fixtures/page-<n>.html with an ETag and
+answer conditional requests with 304, so the scraper can be exercised
+without touching the real site:
+
+    python benchmarks/fixture_server.py --port 8765
+    python -m app.scraper --hours 1 --delay 0 --base-url http://127.0.0.1:8765/p2000.py
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from typing import Set
+import argparse
+import gzip
+import hashlib
+import os
+import sys
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+def load_page(page: int) -> bytes:
+    """Load a fixture page, or an empty result page past the last fixture."""
+    path = os.path.join(FIXTURES_DIR, f'page-{page}.html')
+    if not os.path.exists(path):
+        return b'<html><body><table></table></body></html>'
+    with open(path, 'rb') as f:
+        return f.read()
+
+def make_handler(fail_pages: Set[int]):
+    class FixtureHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            query = parse_qs(urlparse(self.path).query)
+            page = int(query.get('pagina', ['1'])[0])
+
+            if page in fail_pages:
+                self.send_response(500)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+
+            body = load_page(page)
+            etag = '"%s"' % hashlib.sha1(body).hexdigest()
+
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('ETag', etag)
+            if 'gzip' in self.headers.get('Accept-Encoding', ''):
+                body = gzip.compress(body)
+                self.send_header('Content-Encoding', 'gzip')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            sys.stderr.write(f"{self.address_string()} - {format % args}\n")
+
+    return FixtureHandler
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve P2000 HTML fixtures locally")
+    parser.add_argument('--port', type=int, default=8765, help='Port to listen on (default: 8765)')
+    parser.add_argument('--fail-pages', type=int, nargs='*', default=[],
+                        help='Pages that always answer with a 500 error')
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), make_handler(set(args.fail_pages)))
+    print(f"Serving {FIXTURES_DIR} on http://127.0.0.1:{args.port}/p2000.py")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
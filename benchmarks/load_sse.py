@@ -0,0 +1,145 @@
+"""
+Load test /api/stream with many idle Server-Sent Events clients.
+
+Opens the clients in steps, and at every step samples the memory and CPU
+of the server processes while incidents are ingested into the server's
+database, measuring how long they take to reach every client:
+
+    gunicorn --config gunicorn.stream.conf.py wsgi:app &
+    python benchmarks/load_sse.py --steps 100,250,500 --db data/p2000.db
+
+Server processes are found by matching --match against their command
+line. Raise the open file limit (ulimit -n) for large steps.
+"""
+from datetime import datetime
+from urllib.parse import urlsplit
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MARKER = 'LOADTEST'
+
+def find_pids(match: str):
+    pids = []
+    for pid in filter(str.isdigit, os.listdir('/proc')):
+        try:
+            with open(f'/proc/{pid}/cmdline', 'rb') as f:
+                cmdline = f.read().replace(b'\0', b' ').decode()
+        except OSError:
+            continue
+        if match in cmdline and int(pid) != os.getpid():
+            pids.append(int(pid))
+    return pids
+
+def sample(pids):
+    """Get the total RSS in KiB and CPU time in seconds of the processes."""
+    rss, cpu = 0, 0.0
+    for pid in pids:
+        try:
+            with open(f'/proc/{pid}/status') as f:
+                rss += next(int(line.split()[1]) for line in f if line.startswith('VmRSS:'))
+            with open(f'/proc/{pid}/stat') as f:
+                fields = f.read().rsplit(')', 1)[1].split()
+                cpu += (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+        except (OSError, StopIteration):
+            continue
+    return rss, cpu
+
+class Client:
+    def __init__(self, url: str):
+        self.url = urlsplit(url)
+        self.connected = False
+        self.events = 0
+        self.latencies = []
+
+    async def run(self):
+        reader, writer = await asyncio.open_connection(self.url.hostname, self.url.port or 80)
+        path = self.url.path + (f'?{self.url.query}' if self.url.query else '')
+        writer.write(f"GET {path} HTTP/1.1\r\nHost: {self.url.netloc}\r\n"
+                     f"Accept: text/event-stream\r\n\r\n".encode())
+        await writer.drain()
+        try:
+            async for line in reader:
+                self.connected = True
+                if line.startswith(b'data: '):
+                    self.events += 1
+                    received = time.time()
+                    for incident in json.loads(line[6:])['incidents']:
+                        if incident['message'].startswith(MARKER):
+                            self.latencies.append(received - float(incident['message'].split()[1]))
+        finally:
+            self.connected = False
+            writer.close()
+
+def ingest(db_path: str, count: int):
+    """Store `count` marked incidents through the scraper's ingest path."""
+    from app.scraper import P2000Scraper
+
+    scraper = P2000Scraper(db_path=db_path, delay=0)
+    now = datetime.now()
+    scraper.store_incidents([{
+        'timestamp': now.strftime('%d-%m-%Y %H:%M:%S'),
+        'service_type': 'Ambulance',
+        'region': 'Utrecht',
+        'message': f"{MARKER} {time.time()} {i}",
+        'details': []
+    } for i in range(count)])
+    scraper.close()
+
+async def main():
+    parser = argparse.ArgumentParser(description="Load test the live incident stream")
+    parser.add_argument('--url', default='http://127.0.0.1:8001/api/stream', help='Stream URL')
+    parser.add_argument('--steps', default='50,100,250,500', help='Comma separated client counts')
+    parser.add_argument('--hold', type=float, default=10, help='Seconds to hold every step (default: 10)')
+    parser.add_argument('--match', default='gunicorn', help='Command line of the server processes')
+    parser.add_argument('--db', default=None, help='Server database to ingest test incidents into')
+    parser.add_argument('--ingest-interval', type=float, default=2.0,
+                        help='Seconds between ingested incidents (default: 2)')
+    args = parser.parse_args()
+
+    pids = find_pids(args.match)
+    if not pids:
+        sys.exit(f"No processes matching {args.match!r}")
+    print(f"Sampling {len(pids)} server processes")
+    print(f"{'clients':>8} {'connected':>10} {'RSS MiB':>9} {'CPU %':>7} {'events':>8} "
+          f"{'p50 ms':>8} {'p95 ms':>8}")
+
+    clients, tasks = [], []
+    for step in map(int, args.steps.split(',')):
+        while len(clients) < step:
+            client = Client(args.url)
+            clients.append(client)
+            tasks.append(asyncio.create_task(client.run()))
+        await asyncio.sleep(1)
+
+        for client in clients:
+            client.events = 0
+            client.latencies = []
+        _, cpu_before = sample(pids)
+        started = time.monotonic()
+        while time.monotonic() - started < args.hold:
+            if args.db:
+                await asyncio.to_thread(ingest, args.db, 1)
+            await asyncio.sleep(args.ingest_interval)
+        elapsed = time.monotonic() - started
+        rss, cpu_after = sample(pids)
+
+        latencies = sorted(latency for client in clients for latency in client.latencies)
+        p50 = f"{statistics.median(latencies) * 1000:8.0f}" if latencies else f"{'-':>8}"
+        p95 = f"{latencies[int(len(latencies) * 0.95)] * 1000:8.0f}" if latencies else f"{'-':>8}"
+        print(f"{step:>8} {sum(client.connected for client in clients):>10} {rss / 1024:>9.1f} "
+              f"{(cpu_after - cpu_before) / elapsed * 100:>7.1f} "
+              f"{sum(client.events for client in clients):>8} {p50} {p95}")
+
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,128 @@
+"""
+Local stand-in for the OpenAI chat completions API.
+
+Answers every tool call with arguments generated from the JSON schema of
+the requested tool, so the analysis pipeline and the job worker can run
+without an API key or network access:
+
+    python benchmarks/stub_llm.py --port 8900 --latency 0.5 &
+    OPENAI_API_KEY=stub OPENAI_BASE_URL=http://127.0.0.1:8900/v1 python -m app.cli worker --once
+
+--latency and --jitter simulate a slow model, --fail-rate answers a share
+of the requests with a 500 error.
+"""
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import json
+import random
+import threading
+import time
+
+def generate(schema: dict, defs: dict, name: str = 'value'):
+    """Generate a value matching a (pydantic) JSON schema."""
+    if '$ref' in schema:
+        return generate(defs[schema['$ref'].split('/')[-1]], defs, name)
+    if 'anyOf' in schema:
+        return generate(next(s for s in schema['anyOf'] if s.get('type') != 'null'), defs, name)
+    if 'allOf' in schema:
+        return generate(schema['allOf'][0], defs, name)
+    if 'enum' in schema:
+        return random.choice(schema['enum'])
+
+    kind = schema.get('type', 'string')
+    if kind == 'object':
+        return {key: generate(value, defs, key) for key, value in schema.get('properties', {}).items()}
+    if kind == 'array':
+        return [generate(schema.get('items', {}), defs, name) for _ in range(random.randint(1, 3))]
+    if kind == 'integer':
+        return random.randint(1, 100)
+    if kind == 'number':
+        return round(random.uniform(0, 100), 2)
+    if kind == 'boolean':
+        return random.random() < 0.5
+    if schema.get('format') == 'date-time':
+        return datetime.now().replace(microsecond=0).isoformat()
+    return f"stub {name} {random.randint(1, 9999)}"
+
+class Handler(BaseHTTPRequestHandler):
+    latency = 0.0
+    jitter = 0.0
+    fail_rate = 0.0
+    requests = 0
+    lock = threading.Lock()
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        with Handler.lock:
+            Handler.requests += 1
+        time.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+
+        if random.random() < self.fail_rate:
+            return self.reply(500, {'error': {'message': 'Stub failure', 'type': 'server_error'}})
+
+        message = {'role': 'assistant', 'content': 'stub'}
+        tools = body.get('tools') or []
+        if tools:
+            function = tools[0]['function']
+            parameters = function.get('parameters', {})
+            message = {
+                'role': 'assistant',
+                'content': None,
+                'tool_calls': [{
+                    'id': f"call_{random.randint(0, 10**9)}",
+                    'type': 'function',
+                    'function': {
+                        'name': function['name'],
+                        'arguments': json.dumps(generate(parameters, parameters.get('$defs', {})))
+                    }
+                }]
+            }
+
+        prompt_tokens = len(json.dumps(body.get('messages', []))) // 4
+        self.reply(200, {
+            'id': f"chatcmpl-stub-{Handler.requests}",
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': body.get('model', 'stub'),
+            'choices': [{'index': 0, 'message': message, 'finish_reason': 'tool_calls' if tools else 'stop'}],
+            'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': 200,
+                      'total_tokens': prompt_tokens + 200}
+        })
+
+    def reply(self, status: int, payload: dict):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+def serve(port: int = 8900, latency: float = 0.0, jitter: float = 0.0, fail_rate: float = 0.0) -> ThreadingHTTPServer:
+    """Start the stub in a background thread, returns the server (call shutdown() to stop it)."""
+    Handler.latency, Handler.jitter, Handler.fail_rate = latency, jitter, fail_rate
+    server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub OpenAI chat completions server")
+    parser.add_argument('--port', type=int, default=8900, help='Port to listen on (default: 8900)')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds per response (default: 0)')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Random +/- seconds of latency (default: 0)')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='Share of requests failing with a 500 (default: 0)')
+    args = parser.parse_args()
+
+    serve(args.port, args.latency, args.jitter, args.fail_rate)
+    print(f"Stub LLM listening on http://127.0.0.1:{args.port}/v1")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,5 @@
 import multiprocessing
+import os
 import sys
 
 # Server socket
@@ -7,8 +8,10 @@ backlog = 2048
 
 # Worker processes
 workers = multiprocessing.cpu_count() * 2 + 1
-worker_class = 'sync'
-worker_connections = 1000
+# Threaded workers: every thread keeps its SQLite connection (see db.get_db_connection).
+# /api/stream holds a thread per client here, many clients need gunicorn.stream.conf.py
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', '8'))
 timeout = 30
 keepalive = 2
 
@@ -0,0 +1,30 @@
+import multiprocessing
+
+# Serves /api/stream only, the dashboard connects here when STREAM_URL is set
+bind = "0.0.0.0:8001"
+backlog = 2048
+
+# Async workers, every stream client holds a connection. Under gevent, sqlite3
+# calls block the worker's other clients and connections are per greenlet, so
+# this service only runs the feed poll and reads of clients behind its buffer
+workers = multiprocessing.cpu_count()
+worker_class = 'gevent'
+worker_connections = 1000
+timeout = 30
+keepalive = 2
+
+# Logging
+accesslog = "-"  # Log to stdout
+errorlog = "-"   # Log to stderr
+loglevel = 'info'
+
+# Process naming
+proc_name = 'emergencynl-stream'
+
+# Server mechanics
+daemon = False
+pidfile = None
+umask = 0
+user = None
+group = None
+tmp_upload_dir = None
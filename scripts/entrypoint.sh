@@ -9,11 +9,35 @@ init_database() {
 # Function to start web service
 start_web() {
     echo "Starting web service..."
-    # Initialize database if needed
-    init_database
+    # The scraper service fills the database, a standalone container can opt in to a first scrape
+    if [ "${SCRAPE_ON_START:-0}" = "1" ]; then
+        init_database &
+    fi
     exec gunicorn -b 0.0.0.0:8000 --config gunicorn.conf.py wsgi:app
 }
 
+# Function to start the live stream service
+start_stream() {
+    echo "Starting stream service..."
+    exec gunicorn --config gunicorn.stream.conf.py wsgi:app
+}
+
+# Function to start the scraper daemon
+start_scraper() {
+    echo "Starting scraper daemon..."
+    exec python -m app.scraper --daemon \
+        --minutes "${SCRAPER_INTERVAL:-30}" \
+        --delay "${SCRAPER_DELAY:-1.0}" \
+        --interval "${SCRAPER_POLL_INTERVAL:-60}" \
+        --db-path "${DB_PATH:-data/p2000.db}"
+}
+
+# Function to start the analysis worker
+start_worker() {
+    echo "Starting analysis worker..."
+    exec python -m app.cli worker --interval "${WORKER_POLL_INTERVAL:-5}"
+}
+
 # Function to start cron service
 start_cron() {
     echo "Starting cron service..."
@@ -35,12 +59,21 @@ case "$1" in
     "cron")
         start_cron
         ;;
+    "scraper")
+        start_scraper
+        ;;
+    "worker")
+        start_worker
+        ;;
+    "stream")
+        start_stream
+        ;;
     "web" | "")
         start_web
         ;;
     *)
         echo "Unknown command: $1"
-        echo "Usage: $0 {web|cron}"
+        echo "Usage: $0 {web|cron|scraper|worker|stream}"
         exit 1
         ;;
 esac
\ No newline at end of file
@@ -3,5 +3,5 @@
 # Get yesterday's date in YYYY-MM-DD format
 YESTERDAY=$(date -d "yesterday" +%Y-%m-%d)
 
-# Run the analysis command
-python -m app.cli analyze -f --date $YESTERDAY 
\ No newline at end of file
+# Queue the analysis for the worker, which finishes an intra-day analysis with the last slices
+python -m app.cli enqueue-analysis --date $YESTERDAY 
\ No newline at end of file